@@ -0,0 +1,46 @@
+"""
+Regenerates the offline fixture set with no network: every parcel goes through the backend once,
+cold, against stand-ins started with --save-synthesized, so each tile, mask and Overpass answer
+the backend asks for is written to bench/fixtures/. The stand-ins synthesize deterministically,
+the same backend code always asks for and gets the same files. bench.run replays them after that,
+so the stand-ins aren't synthesizing on the same cores as the backend being timed.
+
+    python -m bench.fixtures
+    python -m bench.fixtures --parcels small_lot,l_shape --out /tmp/fixtures
+
+Run from backend/. Files already in --out are replayed rather than rewritten, delete the directory
+to start over. It's gitignored: a few MB of tiles and masks that this rebuilds in a minute, and
+real recordings (bench.standin --record) hold Mapbox imagery that doesn't belong in the repo.
+"""
+import argparse
+import asyncio
+import os
+from collections import Counter
+
+from bench.parcels import PARCELS
+from bench.run import run
+from bench.standin import FIXTURES_DIR
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Regenerate the bench fixtures from the deterministic stand-ins")
+    parser.add_argument("--parcels", default="", help=f"comma separated, default all of {list(PARCELS)}")
+    parser.add_argument("--out", default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(argparse.Namespace(
+        parcels=args.parcels, requests=1, concurrency=1, latency="", rate_429="",
+        fixtures=args.out, cold=True, save_synthesized=True,
+    )))
+    failed = {r["parcel"]: r["errors"] for r in results if r["ok"] != r["requests"]}
+    if failed:
+        raise SystemExit(f"some parcels failed, their fixtures are incomplete: {failed}")
+
+    files = Counter(
+        os.path.relpath(root, args.out).split(os.sep)[0] for root, _, names in os.walk(args.out) for _ in names
+    )
+    print(f"[Fixtures] {args.out}: " + ", ".join(f"{n} {kind}" for kind, n in sorted(files.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Microbenchmarks for the geometry hot spots in services/geo_converter.py, on synthetic inputs
+across parcel sizes. Each function's output is boiled down to a summary (metadata, counts, areas)
+that can be saved as a baseline and checked on the next run, so a speedup that changes the
+numbers shows up as a mismatch instead of a win.
+
+    python -m bench.micro --save-baseline bench_baseline.json     # before the change
+    python -m bench.micro --baseline bench_baseline.json          # after, times + equality check
+
+Every size also runs both accounting engines and checks the raster one against the vector one,
+on the areas both count the same way: the merged roads, crz and landuse per type, within
+ENGINE_RTOL at the default 0.3 m grid. impervious / demolition aren't compared, the vector engine
+adds overlapping roads and buildings up and the raster one counts each pixel once.
+
+Run from backend/. Exits 1 if anything differs from the baseline or the engines drift apart.
+"""
+import argparse
+import json
+import math
+import statistics
+import sys
+import time
+
+import numpy as np
+import shapely
+
+from bench.synthetic import osm_features, parcel, tiles_with_masks
+from services.geo_converter import (
+    account_features,
+    apply_crz_buffer,
+    clip_features,
+    masks_to_geojson,
+    merge_and_clip_features,
+)
+from services.geometry import geoms_from_features
+from services.raster_accounting import raster_clip_features
+
+# per hectare, roughly a dense urban grid
+BUILDINGS_PER_HA = 25
+ROADS_PER_HA = 4
+LANDUSE_PER_HA = 0.3
+
+# raster vs vector, relative, at 0.3 m. Per road / blob the raster is off by up to half a pixel
+# each side, it averages out over a parcel. Coarser grids get noisier on small features
+ENGINE_RTOL = 0.02
+
+
+def build_inputs(size_m: float, seed: int = 0) -> dict:
+    polygon = parcel(size_m)
+    hectares = size_m * size_m / 10_000
+    osm = osm_features(
+        polygon,
+        buildings=round(BUILDINGS_PER_HA * hectares),
+        roads=round(ROADS_PER_HA * hectares),
+        landuse=max(1, round(LANDUSE_PER_HA * hectares)),
+        seed=seed,
+    )
+    tiles = tiles_with_masks(polygon, seed=seed)
+    segmentation = [f for tile, masks in tiles for f in masks_to_geojson(masks, tile["bounds"])]
+    return {"polygon": polygon, "osm": osm, "tiles": tiles, "segmentation": segmentation}
+
+
+def summarize_features(features: list[dict], key: str) -> dict:
+    """{group: [count, total area in deg²]}"""
+    areas = shapely.area(geoms_from_features(features)) if features else np.zeros(0)
+    out: dict[str, list] = {}
+    for f, area in zip(features, areas):
+        entry = out.setdefault(str(f["properties"].get(key)), [0, 0.0])
+        entry[0] += 1
+        entry[1] += float(area)
+    return out
+
+
+def cases(inputs: dict) -> dict:
+    """name -> (input size, fn to time, fn turning its result into a comparable summary)"""
+    polygon, tiles = inputs["polygon"], inputs["tiles"]
+    all_features = inputs["segmentation"] + inputs["osm"]
+    return {
+        "masks_to_geojson": (
+            f"{len(tiles)} tiles",
+            lambda: [f for tile, masks in tiles for f in masks_to_geojson(masks, tile["bounds"])],
+            lambda out: summarize_features(out, "label"),
+        ),
+        "apply_crz_buffer": (
+            f"{len(inputs['segmentation'])} features",
+            lambda: apply_crz_buffer(inputs["segmentation"]),
+            lambda out: summarize_features(out, "category"),
+        ),
+        "merge_and_clip_features": (
+            f"{len(all_features)} features",
+            lambda: merge_and_clip_features(all_features, polygon),
+            lambda out: {"features": len(out[0]), "metadata": out[1]},
+        ),
+    }
+
+
+def engine_areas(inputs: dict, resolution_m: float) -> dict[str, tuple[float, float]]:
+    """{area: (vector sqft, raster sqft)} for what both engines define the same way"""
+    polygon = inputs["polygon"]
+    all_features = inputs["segmentation"] + inputs["osm"]
+    vector = clip_features(all_features, polygon)
+    raster = raster_clip_features(all_features, polygon, resolution_m=resolution_m)
+    vector_meta, raster_meta = account_features(vector, polygon)[1], account_features(raster, polygon)[1]
+
+    def roads(layers) -> float:
+        return layers.road_feature["properties"]["area_sqft"] if layers.road_feature else 0.0
+
+    areas = {"roads": (roads(vector), roads(raster)), "crz": (vector_meta["crz_sqft"], raster_meta["crz_sqft"])}
+    for ltype, sqft in vector_meta["landuse_breakdown"].items():
+        areas[f"landuse/{ltype}"] = (sqft, raster_meta["landuse_breakdown"].get(ltype, 0.0))
+    return areas
+
+
+def time_case(fn, repeat: int) -> tuple[list[float], object]:
+    times, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def diff(expected, actual, rtol: float, path: str = "") -> list[str]:
+    """Where two summaries differ, floats within rtol count as equal"""
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        out = []
+        for key in sorted(set(expected) | set(actual)):
+            if key not in expected or key not in actual:
+                out.append(f"{path}/{key}: only in {'baseline' if key in expected else 'this run'}")
+            else:
+                out += diff(expected[key], actual[key], rtol, f"{path}/{key}")
+        return out
+    if isinstance(expected, list) and isinstance(actual, list) and len(expected) == len(actual):
+        return [d for i, (e, a) in enumerate(zip(expected, actual)) for d in diff(e, a, rtol, f"{path}[{i}]")]
+    if isinstance(expected, float) or isinstance(actual, float):
+        if isinstance(expected, (int, float)) and isinstance(actual, (int, float)) and math.isclose(expected, actual, rel_tol=rtol, abs_tol=1e-9):
+            return []
+    elif expected == actual:
+        return []
+    return [f"{path}: baseline {expected!r}, now {actual!r}"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Geometry microbenchmarks on synthetic inputs")
+    parser.add_argument("--sizes", default="200,400,800", help="parcel sizes in metres")
+    parser.add_argument("--only", default="", help="comma separated subset of the functions")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default="", help="compare against this saved run")
+    parser.add_argument("--save-baseline", default="", help="write this run out as a baseline")
+    parser.add_argument("--rtol", type=float, default=1e-6, help="relative tolerance for float outputs")
+    parser.add_argument("--raster-resolution", type=float, default=0.3, help="grid for the engine check, metres")
+    parser.add_argument("--engine-rtol", type=float, default=ENGINE_RTOL, help="raster vs vector tolerance")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    only = {name for name in args.only.split(",") if name}
+
+    run: dict[str, dict] = {}
+    mismatches: list[str] = []
+    drift: list[str] = []
+    print(f"{'size':>6}  {'function':<26}{'input':>16}{'best ms':>10}{'median ms':>11}{'vs baseline':>13}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        inputs = build_inputs(size, seed=args.seed)
+        for name, (label, fn, summarize) in cases(inputs).items():
+            if only and name not in only:
+                continue
+            times, result = time_case(fn, args.repeat)
+            key = f"{size}/{name}"
+            run[key] = {"input": label, "best_s": min(times), "median_s": statistics.median(times), "summary": summarize(result)}
+
+            speedup = ""
+            if key in baseline:
+                speedup = f"{baseline[key]['best_s'] / run[key]['best_s']:.2f}x"
+                mismatches += [f"{key}{d}" for d in diff(baseline[key]["summary"], run[key]["summary"], args.rtol)]
+            print(f"{size:>5}m  {name:<26}{label:>16}{min(times) * 1000:>10.1f}{statistics.median(times) * 1000:>11.1f}{speedup:>13}")
+
+        for area, (vector, raster) in engine_areas(inputs, args.raster_resolution).items():
+            if not math.isclose(vector, raster, rel_tol=args.engine_rtol, abs_tol=1.0):
+                drift.append(f"{size}/{area}: vector {vector:.0f} sqft, raster {raster:.0f} sqft ({raster / vector - 1:+.1%})")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if drift:
+        print(f"\nRaster engine off from the vector one by more than {args.engine_rtol:.0%}:")
+        for line in drift:
+            print(f"  {line}")
+    else:
+        print(f"\nRaster engine within {args.engine_rtol:.0%} of the vector one")
+
+    if args.baseline:
+        if mismatches:
+            print(f"\n{len(mismatches)} outputs differ from {args.baseline}:")
+            for line in mismatches[:50]:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nOutputs match {args.baseline}")
+    if drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
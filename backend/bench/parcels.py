@@ -0,0 +1,20 @@
+"""Parcel polygons the benchmark drives /analyze with, downtown Austin, z18 tile counts in comments"""
+
+
+def _feature(ring: list[list[float]]) -> dict:
+    return {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [ring + ring[:1]]}}
+
+
+PARCELS: dict[str, dict] = {
+    # single residential lot, 2 tiles
+    "small_lot": _feature([[-97.7431, 30.2672], [-97.7427, 30.2672], [-97.7427, 30.2675], [-97.7431, 30.2675]]),
+    # L shaped assemblage, the pruned tile grid matters here, 7 tiles
+    "l_shape": _feature([
+        [-97.7460, 30.2650], [-97.7430, 30.2650], [-97.7430, 30.2660],
+        [-97.7445, 30.2660], [-97.7445, 30.2680], [-97.7460, 30.2680],
+    ]),
+    # a few downtown blocks, 20 tiles
+    "dense_downtown": _feature([[-97.7450, 30.2660], [-97.7400, 30.2660], [-97.7400, 30.2700], [-97.7450, 30.2700]]),
+    # right under the 50 tile limit, 49 tiles
+    "max_tiles": _feature([[-97.7490, 30.2630], [-97.7402, 30.2630], [-97.7402, 30.2705], [-97.7490, 30.2705]]),
+}
@@ -0,0 +1,238 @@
+"""
+End-to-end benchmark with no network: starts the upstream stand-ins and the backend as separate
+processes, drives /analyze for every parcel in the library and reports latency, throughput,
+peak RSS of the backend and per-stage times (from metadata.timings).
+
+    python -m bench.run --requests 20 --concurrency 4
+    python -m bench.run --parcels small_lot,l_shape --latency hf=400,overpass=1500 --rate-429 overpass=0.1 --cold
+    python -m bench.run --json bench_output.json
+
+Run from backend/. Every run gets fresh caches in a temp dir. Without --cold, requests after the
+first one per parcel hit the tile / mask / OSM caches like repeat analyses do in production.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import numpy as np
+
+from bench.parcels import PARCELS
+from bench.standin import FIXTURES_DIR, parse_per_upstream
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port(count: int = 1) -> int:
+    """Start of count consecutive free ports"""
+    for _ in range(50):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            base = s.getsockname()[1]
+        if base + count < 65536 and all(_port_free(base + i) for i in range(count)):
+            return base
+    raise RuntimeError("no free ports")
+
+
+def _port_free(port: int) -> bool:
+    with socket.socket() as s:
+        try:
+            s.bind(("127.0.0.1", port))
+        except OSError:
+            return False
+    return True
+
+
+def _rss_mb(pid: int) -> float:
+    # linux only, the benchmark boxes are
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+async def _wait_ready(url: str, proc: subprocess.Popen, timeout_s: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"{proc.args} exited with {proc.returncode}")
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} not up after {timeout_s}s")
+
+
+def start_standins(args, port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "bench.standin", "--port", str(port),
+        "--latency", args.latency, "--rate-429", args.rate_429, "--fixtures", args.fixtures,
+    ]
+    if args.save_synthesized:
+        cmd.append("--save-synthesized")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR)
+
+
+def start_backend(args, port: int, standin_port: int, cache_dir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "MAPBOX_ACCESS_TOKEN": "bench",
+        "HF_ACCESS_TOKEN": "bench",
+        "SEGMENTATION_BACKEND": "hf",
+        "MAPBOX_BASE_URL": f"http://127.0.0.1:{standin_port}",
+        "HF_BASE_URL": f"http://127.0.0.1:{standin_port + 1}",
+        # two mirrors on the same stand-in, so hedging and 429 fallbacks have somewhere to go
+        "OVERPASS_URLS": f"http://127.0.0.1:{standin_port + 2}/a/api/interpreter,http://127.0.0.1:{standin_port + 2}/b/api/interpreter",
+        "TILE_CACHE_PATH": os.path.join(cache_dir, "tiles.sqlite"),
+        "MASK_CACHE_PATH": os.path.join(cache_dir, "masks.sqlite"),
+        "OSM_CACHE_PATH": os.path.join(cache_dir, "osm.sqlite"),
+    }
+    if args.cold:
+        # every lookup is a miss, so each request runs the whole pipeline
+        env["TILE_CACHE_TTL_DAYS"] = "0"
+        env["OSM_CACHE_TTL_DAYS"] = "0"
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    log = open(os.path.join(cache_dir, "backend.log"), "w")
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def bench_parcel(name: str, url: str, backend_pid: int, requests: int, concurrency: int) -> dict:
+    parcel = PARCELS[name]
+    latencies: list[float] = []
+    timings: list[dict] = []
+    errors: dict[str, int] = {}
+    peak_rss = _rss_mb(backend_pid)
+    todo = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for _ in todo:
+            start = time.perf_counter()
+            try:
+                r = await client.post(f"{url}/analyze", json=parcel, timeout=300.0)
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            if r.status_code != 200:
+                errors[str(r.status_code)] = errors.get(str(r.status_code), 0) + 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            timings.append(r.json()["metadata"].get("timings") or {})
+
+    async def sample_rss(stop: asyncio.Event) -> None:
+        nonlocal peak_rss
+        while not stop.is_set():
+            peak_rss = max(peak_rss, _rss_mb(backend_pid))
+            await asyncio.sleep(0.05)
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(stop))
+    start = time.perf_counter()
+    async with httpx.AsyncClient() as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    stop.set()
+    await sampler
+
+    # a request whose tiles were coalesced onto another one's never ran those stages itself (it has tile_wait
+    # instead), leave it out
+    stages = {}
+    for stage in sorted({stage for t in timings for stage in t}):
+        ms = [t[stage] for t in timings if stage in t]
+        stages[stage] = {"n": len(ms), "p50": _pct(ms, 50), "p95": _pct(ms, 95)}
+    return {
+        "parcel": name,
+        "requests": requests,
+        "ok": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "p50_ms": _pct(latencies, 50) * 1000,
+        "p95_ms": _pct(latencies, 95) * 1000,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "peak_rss_mb": peak_rss,
+        "stages_ms": stages,
+    }
+
+
+def _pct(values: list[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else float("nan")
+
+
+def print_report(results: list[dict]) -> None:
+    print(f"\n{'parcel':<16}{'ok':>8}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>8}{'peak RSS MB':>13}  errors")
+    for r in results:
+        print(
+            f"{r['parcel']:<16}{r['ok']:>4}/{r['requests']:<3}{r['p50_ms']:>10.0f}{r['p95_ms']:>10.0f}"
+            f"{r['throughput_rps']:>8.2f}{r['peak_rss_mb']:>13.0f}  {r['errors'] or ''}"
+        )
+    for r in results:
+        print(f"\n{r['parcel']} stages (ms, tile stages summed over tiles)")
+        for stage, ms in r["stages_ms"].items():
+            print(f"  {stage:<16}p50 {ms['p50']:>9.1f}   p95 {ms['p95']:>9.1f}   ({ms['n']} requests)")
+
+
+async def run(args) -> list[dict]:
+    names = [n for n in args.parcels.split(",") if n] or list(PARCELS)
+    unknown = [n for n in names if n not in PARCELS]
+    if unknown:
+        raise SystemExit(f"unknown parcels {unknown}, have {list(PARCELS)}")
+
+    standin_port, backend_port = _free_port(3), _free_port()
+    with tempfile.TemporaryDirectory(prefix="bench-") as cache_dir:
+        standins = start_standins(args, standin_port)
+        backend = start_backend(args, backend_port, standin_port, cache_dir)
+        url = f"http://127.0.0.1:{backend_port}"
+        try:
+            await _wait_ready(f"http://127.0.0.1:{standin_port}/stats", standins)
+            await _wait_ready(f"{url}/metrics", backend)
+            results = []
+            for name in names:
+                print(f"[Bench] {name}: {args.requests} requests, concurrency {args.concurrency}")
+                results.append(await bench_parcel(name, url, backend.pid, args.requests, args.concurrency))
+            return results
+        finally:
+            for proc in (backend, standins):
+                proc.send_signal(signal.SIGINT)
+            for proc in (backend, standins):
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end /analyze benchmark")
+    parser.add_argument("--parcels", default="", help=f"comma separated, default all of {list(PARCELS)}")
+    parser.add_argument("--requests", type=int, default=10, help="per parcel")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--latency", default="mapbox=60,hf=300,overpass=800", help="stand-in latency ms per upstream")
+    parser.add_argument("--rate-429", default="", help="429 probability per upstream, e.g. overpass=0.1")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="recorded responses, see bench.fixtures")
+    parser.add_argument("--cold", action="store_true", help="bypass the tile/mask/OSM caches")
+    parser.add_argument("--json", default="", help="also write the results here")
+    parser.set_defaults(save_synthesized=False)  # bench.fixtures turns it on
+    args = parser.parse_args()
+    parse_per_upstream(args.latency)
+    parse_per_upstream(args.rate_429)
+
+    results = asyncio.run(run(args))
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""
+Local stand-ins for Mapbox, the HuggingFace router and Overpass, so the whole pipeline can be
+benchmarked with no network. Each upstream gets its own port (the backend limits concurrency per
+host:port, same as it does per real host).
+
+Responses come from recorded fixtures when there is one, otherwise they're synthesized
+deterministically: tiles with tree crowns and roads drawn in, masks thresholded out of whatever
+tile gets posted, and OSM buildings / roads / trees on a fixed lattice so overlapping bboxes agree.
+With --record, anything missing is fetched from the real upstream and saved first (needs network
+and real tokens in the backend's .env). With --save-synthesized the synthesized answers get saved
+instead, that's how bench.fixtures regenerates the offline set.
+
+    python -m bench.standin --port 9100 --latency hf=400,overpass=1500 --rate-429 overpass=0.1
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import re
+from dataclasses import dataclass
+from urllib.parse import parse_qs
+
+import cv2
+import httpx
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from PIL import Image
+
+UPSTREAMS = ("mapbox", "hf", "overpass")
+REAL_URLS = {
+    "mapbox": "https://api.mapbox.com",
+    "hf": "https://router.huggingface.co",
+    "overpass": "https://overpass-api.de",
+}
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# synthetic OSM lattice, in degrees: a building plot every ~30m, a street every ~150m
+PLOT_DEG = 0.0003
+STREET_EVERY = 5
+
+
+@dataclass
+class Fault:
+    latency_ms: float = 0.0
+    jitter: float = 0.25  # latency is scaled by uniform(1 - jitter, 1 + jitter)
+    rate_429: float = 0.0
+
+
+def build_app(
+    upstream: str,
+    fault: Fault,
+    fixtures_dir: str = FIXTURES_DIR,
+    record: bool = False,
+    seed: int = 0,
+    save_synthesized: bool = False,
+) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+    counts = {"requests": 0, "429": 0, "recorded": 0, "replayed": 0, "synthesized": 0}
+
+    async def respond(kind: str, key: str, ext: str, media_type: str, synthesize, forward) -> Response:
+        counts["requests"] += 1
+        if fault.latency_ms:
+            await asyncio.sleep(fault.latency_ms * rng.uniform(1 - fault.jitter, 1 + fault.jitter) / 1000)
+        if rng.random() < fault.rate_429:
+            counts["429"] += 1
+            return Response(status_code=429, headers={"Retry-After": "1"})
+
+        path = os.path.join(fixtures_dir, kind, f"{key}.{ext}")
+        if os.path.exists(path):
+            counts["replayed"] += 1
+            with open(path, "rb") as f:
+                return Response(f.read(), media_type=media_type)
+
+        if record:
+            response = await forward()
+            if response.status_code != 200:
+                return Response(response.content, status_code=response.status_code)
+            _save(path, response.content)
+            counts["recorded"] += 1
+            return Response(response.content, media_type=media_type)
+
+        counts["synthesized"] += 1
+        content = await asyncio.to_thread(synthesize)
+        if save_synthesized:
+            _save(path, content)
+        return Response(content, media_type=media_type)
+
+    @app.get("/stats")
+    async def stats() -> dict:
+        return counts
+
+    if upstream == "mapbox":
+        @app.get("/v4/mapbox.satellite/{zoom}/{x}/{name}")
+        async def tile(zoom: int, x: int, name: str, request: Request) -> Response:
+            y = int(name.split("@")[0])
+            return await respond(
+                "mapbox", f"{zoom}/{x}/{y}", "jpg", "image/jpeg",
+                lambda: synth_tile(zoom, x, y),
+                lambda: _forward("GET", f"{REAL_URLS['mapbox']}{request.url.path}?{request.url.query}"),
+            )
+
+    elif upstream == "hf":
+        @app.post("/hf-inference/models/{model:path}")
+        async def segment(model: str, request: Request) -> Response:
+            body = await request.body()
+            return await respond(
+                "hf", hashlib.sha1(body).hexdigest(), "json", "application/json",
+                lambda: json.dumps(synth_segments(body)).encode(),
+                lambda: _forward(
+                    "POST", f"{REAL_URLS['hf']}{request.url.path}", content=body,
+                    headers={k: v for k, v in request.headers.items() if k.lower() in ("authorization", "content-type")},
+                ),
+            )
+
+    elif upstream == "overpass":
+        # any path ending in /api/interpreter, so one port can play several mirrors (/a/api/interpreter, ...)
+        @app.post("/{mirror:path}api/interpreter")
+        async def interpreter(mirror: str, request: Request) -> Response:
+            body = await request.body()
+            query = parse_qs(body.decode())["data"][0]
+            return await respond(
+                "overpass", hashlib.sha1(query.encode()).hexdigest(), "json", "application/json",
+                lambda: json.dumps(synth_overpass(query)).encode(),
+                lambda: _forward("POST", f"{REAL_URLS['overpass']}/api/interpreter", data={"data": query}),
+            )
+
+    return app
+
+
+def _save(path: str, content: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+async def _forward(method: str, url: str, **kwargs) -> httpx.Response:
+    async with httpx.AsyncClient(timeout=90.0) as client:
+        return await client.request(method, url, **kwargs)
+
+
+def synth_tile(zoom: int, x: int, y: int, size: int = 512) -> bytes:
+    """Dusty background, a couple of roads and a scatter of tree crowns, same pixels every time"""
+    rng = np.random.default_rng([zoom, x, y])
+    image = np.empty((size, size, 3), dtype=np.uint8)
+    image[:] = (120, 140, 150)  # BGR
+    image = cv2.add(image, rng.integers(0, 25, (size, size, 3), dtype=np.uint8))
+    for _ in range(int(rng.integers(1, 4))):
+        horizontal = rng.random() < 0.5
+        at, width = int(rng.integers(0, size)), int(rng.integers(12, 30))
+        p1, p2 = ((0, at), (size, at)) if horizontal else ((at, 0), (at, size))
+        cv2.line(image, p1, p2, (115, 115, 115), width)
+    for _ in range(int(rng.integers(10, 60))):
+        center = tuple(int(v) for v in rng.integers(0, size, 2))
+        cv2.circle(image, center, int(rng.integers(8, 40)), (40, 120, 50), -1)
+    ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return buf.tobytes()
+
+
+def synth_segments(jpeg: bytes) -> list[dict]:
+    """HF router style answer (label + base64 png mask) thresholded out of the posted tile"""
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return []
+    b, g, r = (image[:, :, i].astype(np.int16) for i in range(3))
+    spread = np.maximum(np.maximum(b, g), r) - np.minimum(np.minimum(b, g), r)
+    masks = {
+        "tree": (g > r + 30) & (g > b + 30),
+        "road": (spread < 12) & (g > 95) & (g < 135),
+        "building": (spread >= 12) & ~((g > r + 30) & (g > b + 30)),  # not tracked, dropped by the backend
+    }
+    segments = []
+    for label, mask in masks.items():
+        mask = cv2.morphologyEx(mask.astype(np.uint8) * 255, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+        buf = io.BytesIO()
+        Image.fromarray(mask).save(buf, format="PNG")
+        segments.append({"score": 1.0, "label": label, "mask": base64.b64encode(buf.getvalue()).decode()})
+    return segments
+
+
+def synth_overpass(query: str) -> dict:
+    """Buildings, streets, trees and landuse on a fixed lattice, ways first then nodes like `out body; >; out skel qt`"""
+    south, west, north, east = map(float, re.search(r"\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)", query).groups())
+    i0, i1 = math.floor(west / PLOT_DEG), math.ceil(east / PLOT_DEG)
+    j0, j1 = math.floor(south / PLOT_DEG), math.ceil(north / PLOT_DEG)
+    ways, nodes, tagged = [], {}, []
+
+    def node(kind: int, i: int, j: int, corner: int) -> int:
+        node_id = ((kind * 10_000_000 + (i + 5_000_000)) * 10_000_000 + (j + 5_000_000)) * 10 + corner
+        if node_id not in nodes:
+            lon = (i + (corner in (1, 2)) * 0.7 + 0.15) * PLOT_DEG if kind == 1 else i * PLOT_DEG
+            lat = (j + (corner in (2, 3)) * 0.7 + 0.15) * PLOT_DEG if kind == 1 else j * PLOT_DEG
+            nodes[node_id] = {"type": "node", "id": node_id, "lat": lat, "lon": lon}
+        return node_id
+
+    for i in range(i0, i1):
+        for j in range(j0, j1):
+            if i % STREET_EVERY == 0 or j % STREET_EVERY == 0:
+                continue
+            cell = random.Random(i * 1_000_003 + j)
+            roll = cell.random()
+            if roll < 0.6:
+                ring = [node(1, i, j, c) for c in range(4)]
+                tags = {"building": cell.choice(("yes", "house", "commercial", "garage"))}
+                if cell.random() < 0.5:
+                    tags["building:levels"] = str(cell.randint(1, 6))
+                if cell.random() < 0.3:
+                    tags["start_date"] = str(cell.randint(1920, 2015))
+                ways.append({"type": "way", "id": (i + 5_000_000) * 10_000_000 + j + 5_000_000, "nodes": ring + ring[:1], "tags": tags})
+            elif roll < 0.8:
+                tree = node(2, i, j, 0)
+                nodes[tree]["tags"] = {"natural": "tree"}
+                tagged.append(tree)
+
+    # streets along every STREET_EVERY-th lattice line, as long as the bbox
+    for i in range(i0 - i0 % STREET_EVERY, i1 + 1, STREET_EVERY):
+        ways.append({"type": "way", "id": 7_000_000_000 + i, "nodes": [node(3, i, j0, 0), node(3, i, j1, 0)],
+                     "tags": {"highway": "primary" if i % (STREET_EVERY * 4) == 0 else "residential", "name": f"Street {i}"}})
+    for j in range(j0 - j0 % STREET_EVERY, j1 + 1, STREET_EVERY):
+        ways.append({"type": "way", "id": 8_000_000_000 + j, "nodes": [node(3, i0, j, 0), node(3, i1, j, 0)],
+                     "tags": {"highway": "secondary" if j % (STREET_EVERY * 4) == 0 else "residential", "name": f"Avenue {j}"}})
+
+    ways.append({"type": "way", "id": 9_000_000_000, "nodes": [node(3, i0, j0, 0), node(3, i1, j0, 0), node(3, i1, j1, 0), node(3, i0, j1, 0), node(3, i0, j0, 0)],
+                 "tags": {"landuse": "residential"}})
+
+    elements = [nodes[n] for n in tagged] + ways
+    elements += [n for n in nodes.values() if "tags" not in n]
+    return {"version": 0.6, "elements": elements}
+
+
+def parse_per_upstream(raw: str, cast=float) -> dict[str, float]:
+    """'hf=400,overpass=1500' -> {"hf": 400.0, "overpass": 1500.0}"""
+    out = {}
+    for part in filter(None, raw.split(",")):
+        name, value = part.split("=")
+        if name not in UPSTREAMS:
+            raise ValueError(f"unknown upstream {name!r}, expected one of {UPSTREAMS}")
+        out[name] = cast(value)
+    return out
+
+
+async def serve(
+    port: int, faults: dict[str, Fault], fixtures_dir: str, record: bool, seed: int, save_synthesized: bool = False
+) -> None:
+    """mapbox on port, hf on port + 1, overpass on port + 2"""
+    servers = []
+    for offset, upstream in enumerate(UPSTREAMS):
+        app = build_app(upstream, faults[upstream], fixtures_dir, record, seed + offset, save_synthesized)
+        config = uvicorn.Config(app, host="127.0.0.1", port=port + offset, log_level="warning")
+        servers.append(uvicorn.Server(config))
+    await asyncio.gather(*(s.serve() for s in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline stand-ins for Mapbox, HuggingFace and Overpass")
+    parser.add_argument("--port", type=int, default=9100, help="mapbox on port, hf on +1, overpass on +2")
+    parser.add_argument("--latency", default="", help="ms per upstream, e.g. mapbox=80,hf=400,overpass=1500")
+    parser.add_argument("--jitter", type=float, default=0.25)
+    parser.add_argument("--rate-429", default="", help="429 probability per upstream, e.g. overpass=0.1")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    parser.add_argument("--record", action="store_true", help="fetch + save whatever has no fixture yet")
+    parser.add_argument("--save-synthesized", action="store_true", help="save whatever gets synthesized as a fixture")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency = parse_per_upstream(args.latency)
+    rate_429 = parse_per_upstream(args.rate_429)
+    faults = {u: Fault(latency.get(u, 0.0), args.jitter, rate_429.get(u, 0.0)) for u in UPSTREAMS}
+    try:
+        asyncio.run(serve(args.port, faults, args.fixtures, args.record, args.seed, args.save_synthesized))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Synthetic inputs for the geometry microbenchmarks, shaped like what the pipeline really produces:
+OSM buildings / roads / landuse as osm_fetcher emits them, and 512x512 segmentation masks with
+random blobs per label. Everything is seeded, the same arguments always give the same inputs.
+"""
+import math
+
+import cv2
+import numpy as np
+from shapely.geometry import box
+
+from services.tile_fetcher import compute_tile_grid
+
+# downtown Austin, same area as the parcel library
+CENTER = (-97.7430, 30.2672)
+ROAD_TYPES = ("primary", "secondary", "tertiary", "residential", "service", "footway")
+LANDUSE_TYPES = ("residential", "commercial", "retail", "industrial", "grass")
+MATERIALS = ("", "brick", "concrete", "wood", "steel")
+MASK_LABELS = ("tree", "grass", "road", "sidewalk")
+
+
+def parcel(size_m: float, center: tuple[float, float] = CENTER):
+    """Square parcel size_m across"""
+    lng, lat = center
+    half_lat = size_m / 2 / 111320
+    half_lng = half_lat / math.cos(math.radians(lat))
+    return box(lng - half_lng, lat - half_lat, lng + half_lng, lat + half_lat)
+
+
+def osm_features(polygon, buildings: int, roads: int, landuse: int, seed: int = 0) -> list[dict]:
+    """Buildings, roads and landuse scattered over the polygon's bbox (a bit past it, so clipping has work)"""
+    rng = np.random.default_rng(seed)
+    west, south, east, north = polygon.bounds
+    pad = 0.1 * (east - west)
+    west, south, east, north = west - pad, south - pad, east + pad, north + pad
+    deg_per_m = 1 / 111320
+    features = []
+
+    for i in range(buildings):
+        cx, cy = rng.uniform(west, east), rng.uniform(south, north)
+        w, h = rng.uniform(6, 30, 2) * deg_per_m
+        angle = rng.uniform(0, math.pi / 2)
+        corners = np.array([[-w, -h], [w, -h], [w, h], [-w, h]]) / 2
+        rot = np.array([[math.cos(angle), -math.sin(angle)], [math.sin(angle), math.cos(angle)]])
+        ring = (corners @ rot.T + [cx, cy]).tolist()
+        is_minor = bool(rng.random() < 0.1)
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring + ring[:1]]},
+            "properties": {
+                "label": "building",
+                "osm_id": 1_000_000 + i,
+                "building_type": "garage" if is_minor else "yes",
+                "building_levels": int(rng.integers(1, 8)) if rng.random() < 0.6 else None,
+                "building_material": MATERIALS[int(rng.integers(len(MATERIALS)))] or None,
+                "year_built": int(rng.integers(1900, 2020)) if rng.random() < 0.4 else None,
+                "is_hazmat": bool(rng.random() < 0.15),
+                "is_minor": is_minor,
+            },
+        })
+
+    for i in range(roads):
+        start = rng.uniform([west, south], [east, north])
+        heading = rng.uniform(0, 2 * math.pi)
+        steps = int(rng.integers(2, 12))
+        length = rng.uniform(40, 300) * deg_per_m
+        headings = heading + np.cumsum(rng.normal(0, 0.2, steps))
+        offsets = np.column_stack((np.cos(headings), np.sin(headings))) * length / steps
+        coords = np.vstack((start, start + np.cumsum(offsets, axis=0)))
+        road_type = ROAD_TYPES[int(rng.integers(len(ROAD_TYPES)))]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": coords.tolist()},
+            "properties": {
+                "label": "road",
+                "osm_id": 2_000_000 + i,
+                "road_type": road_type,
+                "road_name": f"Road {i}",
+                "road_surface": "asphalt",
+                "road_surface_weight": float(rng.choice((1.0, 1.0, 0.8, 0.5))),
+                "width_m": float(rng.uniform(4, 14)) if rng.random() < 0.2 else None,
+            },
+        })
+
+    for i in range(landuse):
+        cx, cy = rng.uniform(west, east), rng.uniform(south, north)
+        radius = rng.uniform(50, 250) * deg_per_m
+        n = int(rng.integers(5, 16))
+        angles = np.sort(rng.uniform(0, 2 * math.pi, n))
+        radii = radius * rng.uniform(0.6, 1.0, n)
+        ring = np.column_stack((cx + radii * np.cos(angles), cy + radii * np.sin(angles))).tolist()
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring + ring[:1]]},
+            "properties": {
+                "label": "landuse",
+                "osm_id": 3_000_000 + i,
+                "landuse_type": LANDUSE_TYPES[int(rng.integers(len(LANDUSE_TYPES)))],
+                "landuse_name": f"Area {i}" if rng.random() < 0.3 else None,
+            },
+        })
+
+    return features
+
+
+def blob_masks(blobs: int = 40, size: int = 512, seed: int = 0) -> dict[str, np.ndarray]:
+    """One tile's worth of 0/255 masks, random ellipse + stroke blobs per label"""
+    rng = np.random.default_rng(seed)
+    masks = {}
+    for label in MASK_LABELS:
+        mask = np.zeros((size, size), dtype=np.uint8)
+        for _ in range(int(rng.integers(blobs // 2, blobs + 1))):
+            center = tuple(int(v) for v in rng.integers(0, size, 2))
+            if label in ("road", "sidewalk") and rng.random() < 0.7:
+                end = tuple(int(v) for v in rng.integers(0, size, 2))
+                cv2.line(mask, center, end, 255, int(rng.integers(4, 20)))
+            else:
+                axes = tuple(int(v) for v in rng.integers(4, 40, 2))
+                cv2.ellipse(mask, center, axes, float(rng.uniform(0, 180)), 0, 360, 255, -1)
+        # ragged edges like a real segmentation, not clean ellipses
+        noise = (rng.random((size // 8, size // 8)) * 255).astype(np.uint8)
+        noise = cv2.resize(noise, (size, size), interpolation=cv2.INTER_LINEAR)
+        masks[label] = np.where((mask > 0) & (noise > 40), 255, 0).astype(np.uint8)
+    return masks
+
+
+def tiles_with_masks(polygon, zoom: int = 18, blobs: int = 40, seed: int = 0) -> list[tuple[dict, dict[str, np.ndarray]]]:
+    """Every z18 tile the polygon touches, each with its own masks"""
+    tiles = compute_tile_grid(polygon.bounds, zoom=zoom, tile_size=512, polygon=polygon)
+    return [(tile, blob_masks(blobs, seed=seed + i)) for i, tile in enumerate(tiles)]
@@ -1,12 +1,21 @@
+import asyncio
+import json
+import multiprocessing
 import os
+import pstats
 import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
 
 import cv2
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from shapely.geometry import shape
 
 from models import (
@@ -16,17 +25,183 @@ from models import (
     DetectedFeature,
     FeatureGeometry,
     FeatureProperties,
+    UserSettings,
+)
+from services.tile_fetcher import MAPBOX_BASE_URL, compute_tile_grid, fetch_satellite_tile
+from services.segmentation import (
+    HF_BASE_URL,
+    HFRouterBackend,
+    SegmentationBackend,
+    decode_masks,
+    encode_masks,
+    mask_cache_key,
+)
+from services.geo_converter import (
+    account_features,
+    apply_crz_buffer,
+    clip_features,
+    features_from_wkb,
+    masks_to_geojson,
+    masks_to_wkb,
+)
+from services.raster_accounting import raster_clip_features
+from services.multires import plan_refinement
+from services.mosaic import MaskMosaic
+from services.osm_fetcher import OSM_FLIGHTS, OVERPASS_STATS, STREAMING_PARSE, EndpointStats, fetch_osm_features
+from services.osm_store import OsmStore
+from services.disk_cache import DiskCache
+from services.http_client import HOST_CONCURRENCY, UpstreamClient
+from services.seg_scheduler import SegmentationScheduler
+from services.analysis_store import AnalysisStore
+from services.single_flight import SingleFlight
+from services.profiling import ProfileStore, RequestProfile, activate, profiled, record
+from services.metrics import (
+    ANALYSIS_FEATURES,
+    ANALYSIS_TILES,
+    ANALYSIS_VERTICES,
+    STAGE_SECONDS,
+    count_vertices,
+    register_caches,
+    unregister_caches,
+    start_timings,
+    timed,
 )
-from services.tile_fetcher import compute_tile_grid, fetch_satellite_tile
-from services.segmentation import segment_tile
-from services.geo_converter import masks_to_geojson, apply_crz_buffer, merge_and_clip_features
-from services.osm_fetcher import fetch_osm_features
 
 load_dotenv() 
 MAPBOX_TOKEN = os.getenv("MAPBOX_ACCESS_TOKEN", "")
 HF_TOKEN = os.getenv("HF_ACCESS_TOKEN", "")
 
-app = FastAPI()
+# upstream overrides, e.g. the offline stand-ins in bench/. OVERPASS_URLS is a comma separated mirror list
+MAPBOX_URL = os.getenv("MAPBOX_BASE_URL", MAPBOX_BASE_URL).rstrip("/")
+HF_URL = os.getenv("HF_BASE_URL", HF_BASE_URL).rstrip("/")
+OVERPASS_URLS = [u.strip() for u in os.getenv("OVERPASS_URLS", "").split(",") if u.strip()]
+OVERPASS = EndpointStats(OVERPASS_URLS) if OVERPASS_URLS else OVERPASS_STATS
+# overridden upstreams keep the concurrency limit of the host they stand in for
+HOST_LIMITS = {
+    **HOST_CONCURRENCY,
+    urlsplit(MAPBOX_URL).netloc: HOST_CONCURRENCY["api.mapbox.com"],
+    urlsplit(HF_URL).netloc: HOST_CONCURRENCY["router.huggingface.co"],
+}
+
+# "hf" posts tiles to the HuggingFace router, "onnx" runs SegFormer locally on CPU
+SEGMENTATION_BACKEND = os.getenv("SEGMENTATION_BACKEND", "hf").lower()
+SEGFORMER_ONNX_DIR = os.getenv("SEGFORMER_ONNX_DIR", "models/segformer-b0-ade")
+
+
+def open_caches() -> dict[str, DiskCache]:
+    """Opened by the lifespan, not at import, so importing main (bench, tooling) doesn't create cache files"""
+    return {
+        # Mapbox tiles on disk, neighbouring parcels share most of their tiles
+        "tiles": DiskCache(
+            os.getenv("TILE_CACHE_PATH", "cache/tiles.sqlite"),
+            max_bytes=int(float(os.getenv("TILE_CACHE_MAX_MB", "1024")) * 1024 * 1024),
+            ttl_s=float(os.getenv("TILE_CACHE_TTL_DAYS", "30")) * 86400,
+        ),
+        # Bit packed SegFormer masks, a tile seen before skips the fetch and the HF call
+        "masks": DiskCache(
+            os.getenv("MASK_CACHE_PATH", "cache/masks.sqlite"),
+            max_bytes=int(float(os.getenv("MASK_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            # masks go stale with the model, not the imagery, so they get their own TTL (tile TTL if unset)
+            ttl_s=float(os.getenv("MASK_CACHE_TTL_DAYS", os.getenv("TILE_CACHE_TTL_DAYS", "30"))) * 86400,
+        ),
+        # OSM features per z16 cell, nearby analyses reuse cells instead of hitting Overpass
+        "osm": DiskCache(
+            os.getenv("OSM_CACHE_PATH", "cache/osm.sqlite"),
+            max_bytes=int(float(os.getenv("OSM_CACHE_MAX_MB", "512")) * 1024 * 1024),
+            ttl_s=float(os.getenv("OSM_CACHE_TTL_DAYS", "7")) * 86400,
+        ),
+    }
+
+
+# multires requests: coarse pass at MULTIRES_COARSE_ZOOM, mixed quadrants refined to MULTIRES_FINE_ZOOM.
+# MAX_TILES caps the first pass either way, MULTIRES_MAX_REFINE caps the second
+MAX_TILES = 50
+MULTIRES_COARSE_ZOOM = int(os.getenv("MULTIRES_COARSE_ZOOM", "17"))
+MULTIRES_FINE_ZOOM = int(os.getenv("MULTIRES_FINE_ZOOM", "18"))
+MULTIRES_MAX_REFINE = int(os.getenv("MULTIRES_MAX_REFINE", "150"))
+
+# paste every tile's masks into one raster and contour that once for the analysis, instead of
+# unioning per tile fragments back together. Single zoom only, multires requests skip it.
+# Mosaics bigger than MOSAIC_MEMMAP_MB per label go to a temp file
+MASK_STITCHING = os.getenv("MASK_STITCHING", "0") == "1"
+MOSAIC_MEMMAP_MB = float(os.getenv("MOSAIC_MEMMAP_MB", "256"))
+
+# "raster" burns everything into one RASTER_RESOLUTION_M grid over the polygon and counts pixels,
+# overlapping roads/canopy/segmentation count once. "vector" is the exact shapely clip + union
+ACCOUNTING_ENGINE = os.getenv("ACCOUNTING_ENGINE", "vector").lower()
+RASTER_RESOLUTION_M = float(os.getenv("RASTER_RESOLUTION_M", "0.3"))
+
+# contouring + the per label / landuse unions in worker processes, they're GEOS/GIL bound so threads
+# don't scale. 0 keeps everything on threads in this process
+GEO_PROCESS_WORKERS = int(os.getenv("GEO_PROCESS_WORKERS", "0"))
+
+# in-flight tile work, keyed like the mask cache
+TILE_FLIGHTS = SingleFlight()
+
+# ingested regional extract (python -m services.osm_store ingest ...), replaces Overpass when set
+OSM_STORE_PATH = os.getenv("OSM_STORE_PATH", "")
+OSM_STORE = OsmStore(OSM_STORE_PATH) if OSM_STORE_PATH else None
+
+# clipped geometry of recent analyses, lets /analyze/{id}/recompute skip the whole pipeline
+ANALYSES = AnalysisStore(
+    max_entries=int(os.getenv("ANALYSIS_STORE_MAX", "200")),
+    ttl_s=float(os.getenv("ANALYSIS_STORE_TTL_MIN", "60")) * 60,
+)
+
+# debug profiling: with this on, an X-Debug-Profile: 1 header or ?profile=1 cProfiles that request's
+# worker thread work and keeps its inputs, fetch them from /debug/profiles/{id}. Off in production
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILES = ProfileStore(max_entries=int(os.getenv("PROFILE_STORE_MAX", "20")))
+PROFILE_FORMATS = ("json", "pstats")
+PROFILE_SORT_KEYS = {key.value for key in pstats.SortKey}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not STREAMING_PARSE:
+        print("[OSM] ijson not installed, Overpass responses get loaded whole instead of streamed (pip install -r requirements.txt)")
+    app.state.caches = open_caches()
+    # hits/misses + hit ratio on /metrics, read from the caches at scrape time
+    cache_collector = register_caches(app.state.caches)
+    # one pooled client for the whole app, connections to Mapbox/HF/Overpass stay warm between requests
+    app.state.http = UpstreamClient(host_limits=HOST_LIMITS)
+    # every request's tiles go through one scheduler so they batch together and share the backend's slots
+    app.state.segmenter = SegmentationScheduler(
+        build_segmenter(app.state.http),
+        max_concurrency=int(os.getenv("SEGMENTATION_CONCURRENCY", "8" if SEGMENTATION_BACKEND == "hf" else "1")),
+        max_wait_ms=float(os.getenv("SEGMENTATION_MAX_WAIT_MS", "20")),
+    )
+    app.state.segmenter.start()
+    # spawn, forking a process that already has the loop, thread pools and sqlite handles isn't safe
+    app.state.geo_pool = ProcessPoolExecutor(
+        GEO_PROCESS_WORKERS, mp_context=multiprocessing.get_context("spawn")
+    ) if GEO_PROCESS_WORKERS > 0 else None
+    yield
+    await app.state.segmenter.stop()
+    await app.state.http.aclose()
+    unregister_caches(cache_collector)
+    for cache in app.state.caches.values():
+        cache.close()
+    if app.state.geo_pool is not None:
+        app.state.geo_pool.shutdown(cancel_futures=True)
+
+
+def build_segmenter(http: UpstreamClient) -> SegmentationBackend:
+    if SEGMENTATION_BACKEND == "onnx":
+        # onnxruntime is optional, only imported when asked for
+        from services.segformer_onnx import OnnxSegformerBackend
+
+        return OnnxSegformerBackend(
+            SEGFORMER_ONNX_DIR,
+            max_batch_size=int(os.getenv("SEGFORMER_BATCH_SIZE", "8")),
+            num_threads=int(os.getenv("SEGFORMER_THREADS", "0")) or None,
+        )
+    if SEGMENTATION_BACKEND == "hf":
+        return HFRouterBackend(HF_TOKEN, http, base_url=HF_URL)
+    raise RuntimeError(f"Unknown SEGMENTATION_BACKEND {SEGMENTATION_BACKEND!r}, expected hf or onnx")
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -36,85 +211,363 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-def process_tile(tile: dict) -> list[dict]:
-    """Fetch one satellite tile, segment it, return raw GeoJSON feature dicts"""
-    image = fetch_satellite_tile(tile, tile_size=512, mapbox_token=MAPBOX_TOKEN)
+async def process_tile(
+    tile: dict, http: UpstreamClient, segmenter: SegmentationScheduler
+) -> tuple[list[dict], dict[str, np.ndarray]]:
+    """Fetch one satellite tile, segment it, return raw GeoJSON feature dicts + the masks they came from"""
+    cache_key = mask_cache_key(tile, segmenter.model_id)
+    # overlapping analyses running at the same time share one fetch + segmentation per tile
+    if TILE_FLIGHTS.in_flight(cache_key):
+        # the stages land in the timings of whoever started it, ours only see the wait
+        with timed("tile_wait"):
+            return await TILE_FLIGHTS.do(cache_key, lambda: _process_tile(tile, cache_key, http, segmenter))
+    return await TILE_FLIGHTS.do(cache_key, lambda: _process_tile(tile, cache_key, http, segmenter))
+
+
+async def _process_tile(
+    tile: dict, cache_key: str, http: UpstreamClient, segmenter: SegmentationScheduler
+) -> tuple[list[dict], dict[str, np.ndarray]]:
+    with timed("mask_cache"):
+        cached = await asyncio.to_thread(app.state.caches["masks"].get, cache_key)
+        masks = await asyncio.to_thread(decode_masks, cached) if cached is not None else None
+    if masks is not None:
+        return await vectorize_masks(masks, tile["bounds"]), masks
+
+    with timed("mapbox"):
+        image = await fetch_satellite_tile(
+            tile, tile_size=512, mapbox_token=MAPBOX_TOKEN, http=http, cache=app.state.caches["tiles"], base_url=MAPBOX_URL
+        )
     if image is None:
-        return []
+        return [], {}
 
-    masks = segment_tile(image, HF_TOKEN)
+    with timed("segmentation"):
+        masks = await segmenter.segment(image)
     if masks is None:
-        return []
+        return [], {}
+    await asyncio.to_thread(lambda: app.state.caches["masks"].put(cache_key, encode_masks(masks)))
+
+    return await vectorize_masks(masks, tile["bounds"]), masks
 
-    return masks_to_geojson(masks, tile["bounds"])
+
+async def vectorize_masks(masks: dict[str, np.ndarray], bounds: list[float]) -> list[dict]:
+    # contouring is CPU bound, run it in a worker (process if there's a pool) so the loop keeps serving other requests
+    pool = app.state.geo_pool
+    with timed("contouring"):
+        if pool is None:
+            return await asyncio.to_thread(profiled, masks_to_geojson, masks, bounds)
+        # polygons come back as WKB, pickling GeoJSON dicts across the process boundary is the slow part
+        labels, wkbs = await asyncio.get_running_loop().run_in_executor(pool, masks_to_wkb, masks, bounds)
+        return await asyncio.to_thread(profiled, features_from_wkb, labels, wkbs)
+
+
+async def fetch_osm(bbox: tuple, http: UpstreamClient) -> list[dict]:
+    with timed("osm"):
+        return await fetch_osm_features(bbox, http, cache=app.state.caches["osm"], store=OSM_STORE, overpass=OVERPASS)
 
 @app.get("/")
 def read_root():
-    return {"message": "Urban Doodle API, POST /analyze"}
+    return {"message": "Urban Doodle API, POST /analyze or /analyze/stream"}
 
 
-@app.post("/analyze", response_model=AnalyzeResponse)
-async def analyze(body: AnalyzeRequest) -> AnalyzeResponse:
+def prepare_analysis(body: AnalyzeRequest) -> tuple:
+    """Validate config + polygon up front so bad requests fail with a status code, even on the stream endpoint"""
     if not MAPBOX_TOKEN:
         raise HTTPException(500, "MAPBOX_ACCESS_TOKEN not set in .env")
-    if not HF_TOKEN:
+    if SEGMENTATION_BACKEND == "hf" and not HF_TOKEN:
         raise HTTPException(500, "HF_ACCESS_TOKEN not set in .env")
 
+    try:
+        user_polygon = shape(body.geometry.model_dump())
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    bbox = user_polygon.bounds  # (west, south, east, north)
+
+    # only tiles the polygon actually reaches, so the limit is on real area rather than the bbox
+    zoom = MULTIRES_COARSE_ZOOM if body.multires else 18
+    tiles = compute_tile_grid(bbox, zoom=zoom, tile_size=512, polygon=user_polygon)
+    if len(tiles) > MAX_TILES:
+        raise HTTPException(400, "Analysis zone too large, please draw a smaller area")
+
+    return user_polygon, bbox, tiles
+
+
+async def run_analysis(
+    body: AnalyzeRequest, user_polygon, bbox: tuple, tiles: list[dict], profile: RequestProfile | None = None
+):
+    """
+    The whole pipeline as a stream of events, in the order things finish:
+      {"event": "osm", "features": [...]}                 raw OSM features as soon as Overpass answers
+      {"event": "tile", "x", "y", "zoom", "features"}     raw segmentation features per tile
+      {"event": "complete", "result": AnalyzeResponse}    merged + clipped features and metadata
+    /analyze only keeps the last one, /analyze/stream forwards all of them.
+    With body.multires the tiles are the coarse pass, once they're all in the mixed quadrants
+    are queued at MULTIRES_FINE_ZOOM and show up as more tile events.
+    With a profile, the worker thread work is profiled into it and the inputs get saved on it.
+    """
     start_time = time.time()
+    http: UpstreamClient = app.state.http
+    segmenter: SegmentationScheduler = app.state.segmenter
+    # before any task starts, they copy the context and add their stage times to this
+    timings = start_timings()
+    # same deal, tasks started from here on profile into it
+    activate(profile)
+    tile_counts: list[dict] = []
+    record("polygon", body.geometry.model_dump())
+    record("tiles", [dict(t) for t in tiles])
+    record("tile_features", tile_counts)
+
+    # single query hits buildings + roads + trees + landuse, way less likely to 429
+    # runs alongside the tiles instead of in front of them
+    osm_task = asyncio.create_task(fetch_osm(bbox, http))
+    tile_tasks = {asyncio.create_task(process_tile(tile, http, segmenter)): tile for tile in tiles}
+
+    tile_features: list[dict] = []
+    osm_features: list[dict] = []
+    coarse_tasks = set(tile_tasks) if body.multires else set()
+    coarse: list[tuple[dict, list[dict]]] = []
+    regions: list[dict] = []
+    mosaic = None
+    if MASK_STITCHING and not body.multires and tiles:
+        mosaic = MaskMosaic(tiles, tile_size=512, memmap_bytes=int(MOSAIC_MEMMAP_MB * 1024 * 1024))
 
+    pending = {osm_task, *tile_tasks}
     try:
-        user_polygon = shape(body.geometry.model_dump())
-        bbox = user_polygon.bounds  # (west, south, east, north)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is osm_task:
+                    osm_features = task.result()
+                    record("osm_features", len(osm_features))
+                    yield {"event": "osm", "features": osm_features}
+                    continue
+
+                tile = tile_tasks[task]
+                features, masks = task.result()
+                tile_counts.append({"x": tile["x"], "y": tile["y"], "zoom": tile["zoom"], "features": len(features)})
+                yield {"event": "tile", "x": tile["x"], "y": tile["y"], "zoom": tile["zoom"], "features": features}
+                if mosaic is not None:
+                    # per tile features are only the live preview, the analysis uses the stitched masks
+                    await asyncio.to_thread(mosaic.add, tile, masks)
+                    continue
+                if task not in coarse_tasks:
+                    tile_features.extend(features)
+                    continue
 
-        tiles = compute_tile_grid(bbox, zoom=18, tile_size=512)
-        if len(tiles) > 50:
-            raise HTTPException(400, "Analysis zone too large, please draw a smaller area")
+                # coarse pass: hold on to it until every coarse tile is in, then decide what to refine
+                coarse.append((tile, features))
+                if len(coarse) == len(coarse_tasks):
+                    with timed("multires_plan"):
+                        refine, kept, regions = await asyncio.to_thread(
+                            profiled, plan_refinement, coarse, user_polygon, MULTIRES_FINE_ZOOM, MULTIRES_MAX_REFINE
+                        )
+                    print(f"[Multires] Refining {len(refine)} of {len(regions)} quadrants at z{MULTIRES_FINE_ZOOM}")
+                    tile_features.extend(kept)
+                    refine_tasks = {asyncio.create_task(process_tile(t, http, segmenter)): t for t in refine}
+                    tile_tasks.update(refine_tasks)
+                    pending |= set(refine_tasks)
 
-        # single query hits buildings + roads + trees + landuse, way less likely to 429
-        osm_features = fetch_osm_features(bbox)
+        if mosaic is not None:
+            with timed("mosaic"):
+                tile_features = await asyncio.to_thread(profiled, mosaic.to_geojson)
+    finally:
+        # if Overpass or a tile blew up (or the client went away) don't leave the rest running in the background
+        for task in pending:
+            task.cancel()
+        if mosaic is not None:
+            mosaic.close()
 
-        all_features: list[dict] = []
-        with ThreadPoolExecutor(max_workers=50) as executor:
-            futures = [executor.submit(process_tile, tile) for tile in tiles]
-            for future in as_completed(futures):
-                all_features.extend(future.result())
+    caches = app.state.caches
+    for name, cache in (("Tiles", caches["tiles"]), ("Masks", caches["masks"]), ("OSM", caches["osm"])):
+        cache_stats = cache.stats()
+        print(f"[{name}] Cache {cache_stats['hits']} hits / {cache_stats['misses']} misses, {cache_stats['bytes'] / 1e6:.1f} MB on disk")
+    for name, flights in (("Tiles", TILE_FLIGHTS), ("OSM", OSM_FLIGHTS)):
+        print(f"[{name}] {flights.stats()['shared']} requests coalesced onto in-flight work")
 
-        all_features.extend(osm_features)
+    all_features = tile_features + osm_features
 
-        final_features, metadata = merge_and_clip_features(
-            all_features, user_polygon, settings=body.settings
+    with timed("merge"):
+        if ACCOUNTING_ENGINE == "raster":
+            layers = await asyncio.to_thread(
+                profiled, raster_clip_features, all_features, user_polygon, resolution_m=RASTER_RESOLUTION_M
+            )
+        else:
+            layers = await asyncio.to_thread(profiled, clip_features, all_features, user_polygon, executor=app.state.geo_pool)
+    with timed("account"):
+        final_features, metadata = await asyncio.to_thread(
+            profiled, account_features, layers, user_polygon, settings=body.settings
         )
+    metadata["regions"] = regions
+    analysis_id = ANALYSES.put(layers, user_polygon, tiles_processed=len(tile_tasks), regions=regions)
 
-        processing_time_ms = (time.time() - start_time) * 1000
+    processing_time_ms = (time.time() - start_time) * 1000
+    STAGE_SECONDS.labels("total").observe(processing_time_ms / 1000)
+    ANALYSIS_TILES.observe(len(tile_tasks))
+    ANALYSIS_FEATURES.labels("tiles").observe(len(tile_features))
+    ANALYSIS_FEATURES.labels("osm").observe(len(osm_features))
+    ANALYSIS_FEATURES.labels("final").observe(len(final_features))
+    ANALYSIS_VERTICES.labels("input").observe(count_vertices(all_features))
+    ANALYSIS_VERTICES.labels("final").observe(count_vertices(final_features))
+    # tile stages are summed over tiles running side by side, so they can add up past the total
+    metadata["timings"] = {stage: round(ms, 1) for stage, ms in timings.items()}
+    record("timings", metadata["timings"])
 
-        detected = [
-            DetectedFeature(
-                type="Feature",
-                geometry=FeatureGeometry(
-                    type=f["geometry"]["type"],
-                    coordinates=f["geometry"]["coordinates"],
-                ),
-                properties=FeatureProperties(**f["properties"]),
-            )
-            for f in final_features
-        ]
-
-        return AnalyzeResponse(
-            type="FeatureCollection",
-            features=detected,
-            metadata=AnalysisMetadata(
-                **metadata,
-                tiles_processed=len(tiles),
-                processing_time_ms=processing_time_ms,
+    yield {
+        "event": "complete",
+        "result": build_response(final_features, metadata, len(tile_tasks), processing_time_ms, analysis_id),
+    }
+
+
+def build_response(
+    final_features: list[dict],
+    metadata: dict,
+    tiles_processed: int,
+    processing_time_ms: float,
+    analysis_id: str,
+) -> AnalyzeResponse:
+    detected = [
+        DetectedFeature(
+            type="Feature",
+            geometry=FeatureGeometry(
+                type=f["geometry"]["type"],
+                coordinates=f["geometry"]["coordinates"],
             ),
+            properties=FeatureProperties(**f["properties"]),
         )
+        for f in final_features
+    ]
+
+    return AnalyzeResponse(
+        type="FeatureCollection",
+        features=detected,
+        metadata=AnalysisMetadata(
+            **metadata,
+            tiles_processed=tiles_processed,
+            processing_time_ms=processing_time_ms,
+        ),
+        analysis_id=analysis_id,
+    )
+
+
+def start_profile(request: Request) -> RequestProfile | None:
+    """Profile for this request if it asked for one and profiling is on"""
+    asked = request.headers.get("x-debug-profile") == "1" or request.query_params.get("profile") == "1"
+    if not (asked and PROFILING_ENABLED):
+        return None
+    profile = RequestProfile()
+    # stored up front so a request that blows up can still be looked at
+    PROFILES.put(profile)
+    return profile
+
 
-    except HTTPException:
+@app.post("/analyze", response_model=AnalyzeResponse)
+async def analyze(body: AnalyzeRequest, request: Request, response: Response) -> AnalyzeResponse:
+    user_polygon, bbox, tiles = prepare_analysis(body)
+    profile = start_profile(request)
+    if profile is not None:
+        response.headers["X-Profile-Id"] = profile.id
+
+    try:
+        async for event in run_analysis(body, user_polygon, bbox, tiles, profile):
+            if event["event"] == "complete":
+                if profile is not None:
+                    profile.status = "complete"
+                return event["result"]
+    except HTTPException as e:
+        if profile is not None:
+            profile.status = f"error: {e.detail}"
         raise
     except Exception as e:
+        if profile is not None:
+            profile.status = f"error: {e}"
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.post("/analyze/{analysis_id}/recompute", response_model=AnalyzeResponse)
+async def recompute(analysis_id: str, settings: UserSettings) -> AnalyzeResponse:
+    """
+    Settings only change the accounting, so re-run just that against the stored clipped geometry
+    """
+    entry = ANALYSES.get(analysis_id)
+    if entry is None:
+        raise HTTPException(404, "Analysis expired, run /analyze again")
+
+    start_time = time.time()
+    try:
+        final_features, metadata = await asyncio.to_thread(
+            account_features, entry["layers"], entry["user_polygon"], settings=settings
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    metadata["regions"] = entry["regions"]
+    processing_time_ms = (time.time() - start_time) * 1000
+    return build_response(final_features, metadata, entry["tiles_processed"], processing_time_ms, analysis_id)
+
+
+@app.post("/analyze/stream")
+async def analyze_stream(body: AnalyzeRequest, request: Request) -> StreamingResponse:
+    """
+    Same analysis as /analyze but as NDJSON, one event per line, so the map can draw
+    OSM features and per-tile segmentation while the rest is still running
+    """
+    user_polygon, bbox, tiles = prepare_analysis(body)
+    profile = start_profile(request)
+
+    async def ndjson():
+        try:
+            async for event in run_analysis(body, user_polygon, bbox, tiles, profile):
+                if event["event"] == "complete":
+                    event = {"event": "complete", "result": event["result"].model_dump(mode="json")}
+                    if profile is not None:
+                        profile.status = "complete"
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            if profile is not None:
+                profile.status = f"error: {e}"
+            # headers are already sent, so errors go down the stream instead of as a status code
+            yield json.dumps({"event": "error", "detail": str(e)}) + "\n"
+
+    headers = {"X-Profile-Id": profile.id} if profile is not None else None
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson", headers=headers)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Prometheus scrape endpoint: stage timings, feature/vertex counts, cache hit ratios, upstream statuses"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/debug/profiles/{profile_id}")
+async def debug_profile(profile_id: str, format: str = "json", sort: str = "cumulative", limit: int = 40) -> Response:
+    """
+    A profiled request's inputs (polygon, tiles, OSM / per tile feature counts, stage timings) and its
+    top functions, or with ?format=pstats the raw stats to open in pstats / snakeviz
+    """
+    profile = PROFILES.get(profile_id) if PROFILING_ENABLED else None
+    if profile is None:
+        raise HTTPException(404, "Profile not found")
+    if format not in PROFILE_FORMATS:
+        raise HTTPException(400, f"format must be one of {', '.join(PROFILE_FORMATS)}")
+    if sort not in PROFILE_SORT_KEYS:
+        raise HTTPException(400, f"sort must be one of {', '.join(sorted(PROFILE_SORT_KEYS))}")
+    if limit < 1:
+        raise HTTPException(400, "limit must be at least 1")
+
+    if format == "pstats":
+        return Response(
+            profile.pstats_bytes(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'},
+        )
+    return JSONResponse({
+        "id": profile.id,
+        "created": profile.created,
+        "status": profile.status,
+        "inputs": profile.inputs,
+        "report": profile.report(limit=limit, sort=sort),
+    })
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -35,6 +35,8 @@ class AnalyzeRequest(BaseModel):
     geometry: PolygonGeometry
     properties: dict | None = None
     settings: UserSettings = UserSettings()
+    # coarse pass over the whole parcel, only the mixed parts get fetched at full zoom. For big sites
+    multires: bool = False
 
 
 # Outgoing
@@ -80,6 +82,10 @@ class DetectedFeature(BaseModel):
     geometry: FeatureGeometry
     properties: FeatureProperties
 
+class ResolutionRegion(BaseModel):
+    zoom: int
+    bounds: list[float]                          # west, south, east, north
+
 class AnalysisMetadata(BaseModel):
     total_area_sqft: float
     # CRZ
@@ -113,8 +119,12 @@ class AnalysisMetadata(BaseModel):
     # Processing
     tiles_processed: int
     processing_time_ms: float
+    regions: list[ResolutionRegion] = []         # multires only, zoom used per part of the parcel
+    timings: Optional[dict[str, float]] = None   # ms per stage, tile stages summed over tiles. Not on recomputes
 
 class AnalyzeResponse(BaseModel):
     type: Literal["FeatureCollection"]
     features: list[DetectedFeature]
     metadata: AnalysisMetadata
+    # pass to /analyze/{analysis_id}/recompute when only the settings change
+    analysis_id: Optional[str] = None
@@ -0,0 +1,42 @@
+import time
+import uuid
+from collections import OrderedDict
+
+from services.geo_converter import ClippedLayers
+
+
+class AnalysisStore:
+    """
+    Recent analyses kept in memory (clipped geometry + polygon) so a settings change
+    can re-run the accounting without touching Mapbox, SegFormer or Overpass again.
+    Least recently used entries fall out past max_entries, anything older than ttl_s is gone.
+    Cleared on server restart, the frontend falls back to a full /analyze.
+    """
+
+    def __init__(self, max_entries: int = 200, ttl_s: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+
+    def put(self, layers: ClippedLayers, user_polygon, tiles_processed: int, regions: list[dict] | None = None) -> str:
+        analysis_id = uuid.uuid4().hex
+        self._entries[analysis_id] = {
+            "layers": layers,
+            "user_polygon": user_polygon,
+            "tiles_processed": tiles_processed,
+            "regions": regions or [],
+            "created": time.time(),
+        }
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return analysis_id
+
+    def get(self, analysis_id: str) -> dict | None:
+        entry = self._entries.get(analysis_id)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl_s:
+            del self._entries[analysis_id]
+            return None
+        self._entries.move_to_end(analysis_id)
+        return entry
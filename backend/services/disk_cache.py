@@ -0,0 +1,117 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    SQLite backed blob store, keyed by string. Evicts least recently used rows
+    once the total payload goes over max_bytes, and treats rows older than ttl_s as misses.
+    One connection shared across threads behind a lock, sqlite is fast enough for this.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024, ttl_s: float | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key      TEXT PRIMARY KEY,
+                data     BLOB NOT NULL,
+                size     INTEGER NOT NULL,
+                created  REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self._size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, size, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            data, size, created = row
+            if self.ttl_s is not None and now - created > self.ttl_s:
+                # stale, drop it so the caller refetches
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._size -= size
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return data
+
+    def put(self, key: str, data: bytes) -> None:
+        now = time.time()
+        size = len(data)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, data, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used rows until we're back under 90% of the limit. Caller holds the lock."""
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if self._size - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+        self._size -= freed
+        self.evictions += len(victims)
+
+    def stats(self) -> dict:
+        # size and counters move together under the lock in get/put, read them the same way
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            size, hits, misses, evictions = self._size, self.hits, self.misses, self.evictions
+        lookups = hits + misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": (hits / lookups) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
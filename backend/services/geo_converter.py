@@ -1,10 +1,23 @@
 import math
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Hashable
 
 import cv2
 import numpy as np
+import shapely
 from shapely.geometry import Polygon, mapping, shape
 from shapely.ops import unary_union
 
+from services.geometry import (
+    area_scale,
+    buffer_lines,
+    clip_to_polygon,
+    contours_to_polygons,
+    geoms_from_features,
+    query_polygon,
+)
+
 # crz = tree protection zones, impervious = hard surfaces that block drainage, demolition = cost calc for devs
 LABEL_GROUPS: dict[str, list[str]] = {
     "crz":        ["tree", "grass"],
@@ -28,20 +41,6 @@ DEMOLITION_LABELS = set(LABEL_GROUPS["demolition"])
 ROAD_LABELS = {"road"}
 
 
-# Default road widths in metres by highway type, used when OSM width tag is missing
-DEFAULT_ROAD_WIDTH_M: dict[str, float] = {
-    "motorway":     12.0,
-    "trunk":        10.0,
-    "primary":       8.0,
-    "secondary":     7.0,
-    "tertiary":      6.0,
-    "residential":   5.0,
-    "service":       4.0,
-    "living_street": 4.0,
-}
-DEFAULT_WIDTH_M = 5.0
-
-
 def masks_to_geojson(
     masks: dict[str, np.ndarray],
     tile_bounds: list[float],
@@ -50,8 +49,34 @@ def masks_to_geojson(
     """
     Convert pixel space binary masks to a list of Feature dicts
     """
+    labels, polys = _mask_polygons(masks, tile_bounds, simplify_tolerance)
+    return _label_features(labels, polys)
+
+
+def masks_to_wkb(
+    masks: dict[str, np.ndarray],
+    tile_bounds: list[float],
+    simplify_tolerance: float = 0.00001,
+) -> tuple[list[str], np.ndarray]:
+    """
+    masks_to_geojson for a worker process: labels + WKB, a lot cheaper to send back than
+    pickled GeoJSON dicts. features_from_wkb turns it into the same features on the other side
+    """
+    labels, polys = _mask_polygons(masks, tile_bounds, simplify_tolerance)
+    return labels, shapely.to_wkb(polys)
+
+
+def features_from_wkb(labels: list[str], wkbs: np.ndarray) -> list[dict]:
+    return _label_features(labels, shapely.from_wkb(wkbs))
+
+
+def _mask_polygons(
+    masks: dict[str, np.ndarray], tile_bounds: list[float], simplify_tolerance: float
+) -> tuple[list[str], np.ndarray]:
+    """Every mask's polygons in one array, with the label of each"""
     west, south, east, north = tile_bounds
-    features = []
+    labels: list[str] = []
+    parts = []
 
     for label, mask in masks.items():
         if mask is None or not np.any(mask):
@@ -60,45 +85,29 @@ def masks_to_geojson(
         h, w = mask.shape
         contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        for contour in contours:
-            if len(contour) < 3:
-                continue
-
-            coords = []
-            for point in contour:
-                px, py = point[0]
-                lng = west + (px / w) * (east - west)
-                lat = north - (py / h) * (north - south)
-                coords.append((lng, lat))
-
-            coords.append(coords[0])  # close the ring
-
-            if len(coords) < 4:
-                continue
+        def to_lng_lat(pixels: np.ndarray) -> np.ndarray:
+            lng = west + (pixels[:, 0] / w) * (east - west)
+            lat = north - (pixels[:, 1] / h) * (north - south)
+            return np.column_stack((lng, lat))
 
-            try:
-                poly = Polygon(coords)
-                if not poly.is_valid:
-                    poly = poly.buffer(0)
-                if poly.is_empty:
-                    continue
+        polys = contours_to_polygons(contours, to_lng_lat, simplify_tolerance)
+        labels += [label] * len(polys)
+        parts.append(polys)
 
-                poly = poly.simplify(simplify_tolerance)
-                if poly.is_empty:
-                    continue
+    return labels, np.concatenate(parts) if parts else np.empty(0, dtype=object)
 
-                geom = mapping(poly)
-                features.append({
-                    "type": "Feature",
-                    "geometry": dict(geom),
-                    "properties": {
-                        "label": label,
-                    },
-                })
-            except Exception:
-                continue
 
-    return features
+def _label_features(labels: list[str], polys: np.ndarray) -> list[dict]:
+    return [
+        {
+            "type": "Feature",
+            "geometry": dict(mapping(poly)),
+            "properties": {
+                "label": label,
+            },
+        }
+        for label, poly in zip(labels, polys)
+    ]
 
 
 def apply_crz_buffer(features: list[dict]) -> list[dict]:
@@ -135,6 +144,221 @@ def merge_and_clip_features(all_features: list[dict],user_polygon, settings=None
     calculate areas, and compute feasibility metadata. Returns (final_features, metadata_dict). 
     to have consistency building costs r seperate while polygons r combined
     """
+    layers = clip_features(all_features, user_polygon)
+    return account_features(layers, user_polygon, settings=settings)
+
+
+@dataclass
+class ClippedLayers:
+    """
+    The geometry half of merge_and_clip_features, everything here is independent of UserSettings.
+    Kept per analysis so a settings change only re-runs account_features on top of it.
+    """
+    # one entry per building: {"geometry": geojson dict, "props": osm props} for the popups,
+    # plus parallel numpy columns so the demo cost math runs over all buildings at once
+    buildings: list[dict] = field(default_factory=list)
+    building_area_sqft: np.ndarray = field(default_factory=lambda: np.zeros(0))
+    building_levels: np.ndarray = field(default_factory=lambda: np.ones(0))
+    building_materials: list[str] = field(default_factory=list)
+    building_material_codes: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.intp))
+    building_hazmat: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    building_minor: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    # sum of road area * surface weight, plus the merged road polygon feature for display
+    road_weighted_sqft: float = 0.0
+    road_feature: dict | None = None
+    # label -> merged + clipped geometry, in the order labels were first seen
+    label_geoms: dict[str, object] = field(default_factory=dict)
+    # landuse doesn't depend on settings at all so it's already final
+    landuse_features: list[dict] = field(default_factory=list)
+    landuse_breakdown: dict[str, float] = field(default_factory=dict)
+    sqft_per_deg2: float = 0.0
+    _category_unions: dict[tuple, object] = field(default_factory=dict, repr=False)
+
+    def category_union(self, labels: tuple[str, ...]) -> tuple[object, dict, float]:
+        """
+        (geometry, geojson, sqft) union of the per-label geometries. Remembered since the same
+        label set comes back on nearly every recompute
+        """
+        if labels not in self._category_unions:
+            geoms = [self.label_geoms[label] for label in labels]
+            merged = geoms[0] if len(geoms) == 1 else unary_union(geoms)
+            self._category_unions[labels] = (merged, dict(mapping(merged)), merged.area * self.sqft_per_deg2)
+        return self._category_unions[labels]
+
+    def impervious_sqft(self, labels: tuple[str, ...], include_roads: bool) -> float:
+        """Segmentation impervious labels plus the surface weighted OSM roads on top"""
+        area = self.category_union(labels)[2] if labels else 0.0
+        return area + (self.road_weighted_sqft if include_roads else 0.0)
+
+
+def _intersecting(geoms: list, user_polygon) -> list:
+    hits, _ = query_polygon(np.array(geoms, dtype=object), user_polygon)
+    return [geoms[i] for i in hits]
+
+
+def _union(geoms: np.ndarray, buffer: float = 0.0, clip=None):
+    if buffer:
+        geoms = shapely.buffer(geoms, buffer, quad_segs=16)
+    merged = shapely.union_all(geoms)
+    return merged if clip is None else merged.intersection(clip)
+
+
+def _union_wkb(wkbs: np.ndarray, buffer: float, clip_wkb: bytes | None) -> bytes:
+    """_union in a pool worker, geometry goes both ways as WKB"""
+    clip = None if clip_wkb is None else shapely.from_wkb(clip_wkb)
+    return shapely.to_wkb(_union(shapely.from_wkb(wkbs), buffer, clip))
+
+
+def _union_all_jobs(jobs: dict[Hashable, tuple], executor: Executor | None = None) -> dict[Hashable, object]:
+    """
+    Runs independent (geoms, buffer, clip) unions, in this thread or spread over a process pool.
+    The unions are GEOS + GIL bound, so threads don't help but processes scale with cores
+    """
+    if executor is None:
+        return {key: _union(*job) for key, job in jobs.items()}
+
+    # biggest first so one huge road network doesn't start last and hold everything up
+    order = sorted(jobs, key=lambda key: -shapely.get_num_coordinates(jobs[key][0]).sum())
+    futures = {}
+    for key in order:
+        geoms, buffer, clip = jobs[key]
+        futures[key] = executor.submit(_union_wkb, shapely.to_wkb(geoms), buffer, None if clip is None else clip.wkb)
+    return {key: shapely.from_wkb(futures[key].result()) for key in jobs}
+
+
+def clip_features(all_features: list[dict], user_polygon, executor: Executor | None = None) -> ClippedLayers:
+    """
+    All the expensive shapely work: clip buildings one by one, buffer + clip roads,
+    union and clip everything else per label, union landuse per type.
+    The unions are independent of each other and go out to executor (a process pool) when given.
+    """
+    meters_per_deg, sqft_per_deg2 = area_scale(user_polygon)
+
+    def to_sqft(shapely_area: float) -> float:
+        return shapely_area * sqft_per_deg2
+
+    # buildings and roads stay individual so popups can show per feature data, everything else gets merged
+    demolition_raw = []
+    road_raw = []
+    landuse_raw = []
+    other_features = []
+    for f in all_features:
+        label = f["properties"].get("label")
+        if label in DEMOLITION_LABELS:
+            demolition_raw.append(f)
+        elif label in ROAD_LABELS and f["properties"].get("road_type"):
+            road_raw.append(f)
+        elif label == "landuse":
+            landuse_raw.append(f)
+        else:
+            other_features.append(f)
+
+    layers = ClippedLayers(sqft_per_deg2=sqft_per_deg2)
+
+    building_clipped = clip_to_polygon(geoms_from_features(demolition_raw), user_polygon)
+    kept = np.flatnonzero(~shapely.is_missing(building_clipped))
+    layers.buildings = [
+        {"geometry": dict(mapping(building_clipped[i])), "props": demolition_raw[i]["properties"]}
+        for i in kept
+    ]
+
+    props = [b["props"] for b in layers.buildings]
+    layers.building_area_sqft = to_sqft(shapely.area(building_clipped[kept]).astype(np.float64))
+    layers.building_levels = np.array([p.get("building_levels") or 1 for p in props], dtype=np.float64)
+    materials = [(p.get("building_material") or "").lower() for p in props]
+    layers.building_materials = sorted(set(materials))
+    material_index = {m: i for i, m in enumerate(layers.building_materials)}
+    layers.building_material_codes = np.array([material_index[m] for m in materials], dtype=np.intp)
+    layers.building_hazmat = np.array([bool(p.get("is_hazmat")) for p in props], dtype=bool)
+    layers.building_minor = np.array([bool(p.get("is_minor", False)) for p in props], dtype=bool)
+
+    # roads: merge into one polygon so overlapping buffers don't stack opacity at intersections
+    road_props = [f["properties"] for f in road_raw]
+    road_geoms = buffer_lines(geoms_from_features(road_raw), road_props, meters_per_deg)
+
+    road_clipped = clip_to_polygon(road_geoms, user_polygon)
+    kept = np.flatnonzero(~shapely.is_missing(road_clipped))
+    weights = np.array([road_props[i].get("road_surface_weight", 1.0) for i in kept], dtype=np.float64)
+    layers.road_weighted_sqft = float(np.sum(to_sqft(shapely.area(road_clipped[kept]).astype(np.float64)) * weights))
+
+    # every union below is collected first and run together
+    jobs: dict[tuple, tuple] = {}
+    if len(kept):
+        jobs[("roads",)] = (road_clipped[kept], 0.0, None)
+
+    # group by label, merge + clip per label. Categories are unions of labels and get built in account_features
+    by_label: dict[str, list] = {}
+    other_props = [f["properties"] for f in other_features]
+    other_geoms = buffer_lines(geoms_from_features(other_features), other_props, meters_per_deg)
+    for props, geom in zip(other_props, other_geoms):
+        if geom is not None:
+            by_label.setdefault(props.get("label", ""), []).append(geom)
+
+    for label, geoms in by_label.items():
+        # blobs outside the polygon would just get cut away again after an expensive union
+        jobs[("label", label)] = (np.array(_intersecting(geoms, user_polygon), dtype=object), 0.000001, user_polygon)
+
+    # landuse kept separate by type so we can show a breakdown in the sidebar
+    by_landuse_type: dict[str, list] = {}
+
+    landuse_clipped = clip_to_polygon(geoms_from_features(landuse_raw), user_polygon)
+    for i in np.flatnonzero(~shapely.is_missing(landuse_clipped)):
+        props = landuse_raw[i]["properties"]
+        ltype = props.get("landuse_type", "unknown")
+        by_landuse_type.setdefault(ltype, []).append((landuse_clipped[i], props))
+
+    for ltype, items in by_landuse_type.items():
+        jobs[("landuse", ltype)] = (np.array([item[0] for item in items], dtype=object), 0.0, None)
+
+    merged_all = _union_all_jobs(jobs, executor)
+
+    if ("roads",) in merged_all:
+        merged_roads = merged_all[("roads",)]
+        if not merged_roads.is_empty:
+            layers.road_feature = {
+                "type": "Feature",
+                "geometry": dict(mapping(merged_roads)),
+                "properties": {
+                    "category": "impervious",
+                    "area_sqft": to_sqft(merged_roads.area),
+                    "color": CATEGORY_COLORS["impervious"],
+                },
+            }
+
+    for label in by_label:
+        layers.label_geoms[label] = merged_all[("label", label)]
+
+    for ltype, items in by_landuse_type.items():
+        merged = merged_all[("landuse", ltype)]
+        if merged.is_empty:
+            continue
+        # Geometrycollection breaks Pydantic validation so skip those
+        if merged.geom_type not in ("Polygon", "MultiPolygon"):
+            continue
+        area_sqft = to_sqft(merged.area)
+        layers.landuse_breakdown[ltype] = round(area_sqft, 1)
+
+        lname = next((item[1].get("landuse_name") for item in items if item[1].get("landuse_name")), None)
+        layers.landuse_features.append({
+            "type": "Feature",
+            "geometry": dict(mapping(merged)),
+            "properties": {
+                "category": "landuse",
+                "area_sqft": area_sqft,
+                "color": CATEGORY_COLORS["landuse"],
+                "landuse_type": ltype,
+                "landuse_name": lname,
+            },
+        })
+
+    return layers
+
+
+def account_features(layers: ClippedLayers, user_polygon, settings=None) -> tuple[list[dict], dict]:
+    """
+    The settings half of merge_and_clip_features: demo costs, impervious budget, setbacks
+    and dev value on top of already clipped geometry. Cheap enough to run on every settings change.
+    """
 
     # Unpack settings, fall back to defaults if none provided
     if settings is None:
@@ -160,12 +384,10 @@ def merge_and_clip_features(all_features: list[dict],user_polygon, settings=None
         setback_rear_ft = settings.setback_rear_ft
         dev_price_per_sqft = settings.dev_price_per_sqft
 
-    center_lat = user_polygon.centroid.y
-    meters_per_deg = 111320 * math.cos(math.radians(center_lat))
-    sqm_per_deg2 = meters_per_deg ** 2
+    meters_per_deg, sqft_per_deg2 = area_scale(user_polygon)
 
     def to_sqft(shapely_area: float) -> float:
-        return shapely_area * sqm_per_deg2 * 10.764
+        return shapely_area * sqft_per_deg2
 
     total_area_sqft = to_sqft(user_polygon.area)
 
@@ -179,146 +401,58 @@ def merge_and_clip_features(all_features: list[dict],user_polygon, settings=None
     else:
         setback_sqft = max(0.0, total_area_sqft - to_sqft(inner_polygon.area))
 
-    # buildings and roads stay individual so popups can show per feature data, everything else gets merged
-    demolition_raw = []
-    road_raw = []
-    landuse_raw = []
-    other_features = []
-    for f in all_features:
-        label = f["properties"].get("label")
-        if label in DEMOLITION_LABELS:
-            demolition_raw.append(f)
-        elif label in ROAD_LABELS and f["properties"].get("road_type"):
-            road_raw.append(f)
-        elif label == "landuse":
-            landuse_raw.append(f)
-        else:
-            other_features.append(f)
-
     final_features: list[dict] = []
     category_sqft: dict[str, float] = {}
 
-    demo_cost_base_total = 0.0
-    demo_cost_hazmat_total = 0.0
-    demo_sqft_total = 0.0
-    building_count = 0
-    minor_structures_sqft = 0.0
-
-    for f in demolition_raw:
-        props = f["properties"]
-        try:
-            poly = shape(f["geometry"]).buffer(0.000001)
-            clipped = poly.intersection(user_polygon)
-            if clipped.is_empty:
-                continue
-        except Exception:
-            continue
-
-        area_sqft = to_sqft(clipped.area)
-        is_minor = props.get("is_minor", False)
-
-        if is_minor and not include_minor:
-            minor_structures_sqft += area_sqft
-            continue
-
-        levels = props.get("building_levels") or 1
-        material = (props.get("building_material") or "").lower()
-        material_mult = demo_material_mults.get(material, 1.0)
-        is_hazmat = props.get("is_hazmat")  # True / False / None
-
-        cost_base = area_sqft * demo_cost_per_sqft * material_mult * levels
-        cost_hazmat = (area_sqft * demo_hazmat_surcharge) if is_hazmat else 0.0
-        cost_total = cost_base + cost_hazmat
-
-        demo_cost_base_total += cost_base
-        demo_cost_hazmat_total += cost_hazmat
-        demo_sqft_total += area_sqft
-        building_count += 1
-
+    # per building costs as column math, the loop below only builds the popup features
+    area = layers.building_area_sqft
+    material_mult = np.array(
+        [demo_material_mults.get(m, 1.0) for m in layers.building_materials], dtype=np.float64
+    )[layers.building_material_codes] if layers.building_materials else np.ones(0)
+    cost_base = area * demo_cost_per_sqft * material_mult * layers.building_levels
+    cost_hazmat = np.where(layers.building_hazmat, area * demo_hazmat_surcharge, 0.0)
+    cost_total = cost_base + cost_hazmat
+
+    counted = ~layers.building_minor | include_minor
+    minor_structures_sqft = float(area[~counted].sum())
+    demo_cost_base_total = float(cost_base[counted].sum())
+    demo_cost_hazmat_total = float(cost_hazmat[counted].sum())
+    demo_sqft_total = float(area[counted].sum())
+    building_count = int(counted.sum())
+
+    for i in np.flatnonzero(counted):
+        props = layers.buildings[i]["props"]
         final_features.append({
             "type": "Feature",
-            "geometry": dict(mapping(clipped)),
+            "geometry": layers.buildings[i]["geometry"],
             "properties": {
                 "category": "demolition",
-                "area_sqft": area_sqft,
+                "area_sqft": float(area[i]),
                 "color": CATEGORY_COLORS["demolition"],
                 "osm_id": props.get("osm_id"),
                 "building_type": props.get("building_type"),
                 "building_levels": props.get("building_levels"),
                 "building_material": props.get("building_material"),
                 "year_built": props.get("year_built"),
-                "is_hazmat": is_hazmat,
+                "is_hazmat": props.get("is_hazmat"),  # True / False / None
                 "addr_number": props.get("addr_number"),
                 "addr_street": props.get("addr_street"),
                 "building_name": props.get("building_name"),
-                "demo_cost_base": round(cost_base, 2),
-                "demo_cost_hazmat": round(cost_hazmat, 2),
-                "demo_cost_total": round(cost_total, 2),
+                "demo_cost_base": round(float(cost_base[i]), 2),
+                "demo_cost_hazmat": round(float(cost_hazmat[i]), 2),
+                "demo_cost_total": round(float(cost_total[i]), 2),
             },
         })
 
     category_sqft["demolition"] = demo_sqft_total
 
-    # roads: merge into one polygon so overlapping buffers don't stack opacity at intersections
-    road_sqft_total = 0.0
-    road_clipped_geoms = []
-
-    for f in road_raw:
-        props = f["properties"]
-
-        if "road" not in impervious_surface_types:
-            continue
-
-        try:
-            geom = shape(f["geometry"])
-            if geom.geom_type in ("LineString", "MultiLineString"):
-                width_m = props.get("width_m") or DEFAULT_ROAD_WIDTH_M.get(
-                    props.get("road_type", ""), DEFAULT_WIDTH_M
-                )
-                half_width_deg = (width_m / 2) / meters_per_deg
-                geom = geom.buffer(half_width_deg)
-
-            clipped = geom.buffer(0.000001).intersection(user_polygon)
-            if clipped.is_empty:
-                continue
-        except Exception:
-            continue
-
-        area_sqft = to_sqft(clipped.area)
-        weight = props.get("road_surface_weight", 1.0)
-        road_sqft_total += area_sqft * weight
-        road_clipped_geoms.append(clipped)
+    include_roads = "road" in impervious_surface_types
+    if include_roads and layers.road_feature is not None:
+        final_features.append(layers.road_feature)
 
-    if road_clipped_geoms:
-        merged_roads = unary_union(road_clipped_geoms)
-        if not merged_roads.is_empty:
-            final_features.append({
-                "type": "Feature",
-                "geometry": dict(mapping(merged_roads)),
-                "properties": {
-                    "category": "impervious",
-                    "area_sqft": to_sqft(merged_roads.area),
-                    "color": CATEGORY_COLORS["impervious"],
-                },
-            })
-
-    # group by label to category, merge per category
-    by_label: dict[str, list] = {}
-    for f in other_features:
-        label = f["properties"].get("label", "")
-        geom = shape(f["geometry"])
-
-        if geom.geom_type in ("LineString", "MultiLineString"):
-            width_m = f["properties"].get("width_m") or DEFAULT_ROAD_WIDTH_M.get(
-                f["properties"].get("road_type", ""), DEFAULT_WIDTH_M
-            )
-            half_width_deg = (width_m / 2) / meters_per_deg
-            geom = geom.buffer(half_width_deg)
-
-        by_label.setdefault(label, []).append(geom)
-
-    by_category: dict[str, list] = {}
-    for label, geoms in by_label.items():
+    # labels to category, then one union per category
+    by_category: dict[str, list[str]] = {}
+    for label in layers.label_geoms:
         if label in LABEL_GROUPS["impervious"] and label not in impervious_surface_types:
             continue
         matched = False
@@ -326,73 +460,34 @@ def merge_and_clip_features(all_features: list[dict],user_polygon, settings=None
             if category == "demolition":
                 continue  # already handled above
             if label in members:
-                by_category.setdefault(category, []).extend(geoms)
+                by_category.setdefault(category, []).append(label)
                 matched = True
         if not matched:
-            by_category.setdefault(label, []).extend(geoms)
+            by_category.setdefault(label, []).append(label)
 
-    for category, geoms in by_category.items():
-        buffered = [g.buffer(0.000001) for g in geoms]
-        merged   = unary_union(buffered)
-        clipped  = merged.intersection(user_polygon)
+    for category, labels in by_category.items():
+        clipped, geojson, area_sqft = layers.category_union(tuple(labels))
 
         if clipped.is_empty:
             continue
 
-        area_sqft = to_sqft(clipped.area)
         category_sqft[category] = area_sqft
 
         final_features.append({
             "type": "Feature",
-            "geometry": dict(mapping(clipped)),
+            "geometry": geojson,
             "properties": {
                 "category": category,
                 "area_sqft": area_sqft,
                 "color": CATEGORY_COLORS.get(category, "#888888"),
             },
         })
-    # landuse kept separate by type so we can show a breakdown in the sidebar
-    landuse_breakdown: dict[str, float] = {}
-    by_landuse_type: dict[str, list] = {}
 
-    for f in landuse_raw:
-        props = f["properties"]
-        ltype = props.get("landuse_type", "unknown")
-        try:
-            poly = shape(f["geometry"]).buffer(0.000001)
-            clipped = poly.intersection(user_polygon)
-            if clipped.is_empty:
-                continue
-        except Exception:
-            continue
-        by_landuse_type.setdefault(ltype, []).append((clipped, props))
-
-    for ltype, items in by_landuse_type.items():
-        geoms = [item[0] for item in items]
-        merged = unary_union(geoms)
-        if merged.is_empty:
-            continue
-        # Geometrycollection breaks Pydantic validation so skip those
-        if merged.geom_type not in ("Polygon", "MultiPolygon"):
-            continue
-        area_sqft = to_sqft(merged.area)
-        landuse_breakdown[ltype] = round(area_sqft, 1)
-
-        lname = next((item[1].get("landuse_name") for item in items if item[1].get("landuse_name")), None)
-        final_features.append({
-            "type": "Feature",
-            "geometry": dict(mapping(merged)),
-            "properties": {
-                "category": "landuse",
-                "area_sqft": area_sqft,
-                "color": CATEGORY_COLORS["landuse"],
-                "landuse_type": ltype,
-                "landuse_name": lname,
-            },
-        })
+    final_features.extend(layers.landuse_features)
+    landuse_breakdown = dict(layers.landuse_breakdown)
 
     # Add individual road sqft to whatever merged impervious came from Segformer
-    impervious_sqft = category_sqft.get("impervious", 0.0) + road_sqft_total
+    impervious_sqft = layers.impervious_sqft(tuple(by_category.get("impervious", [])), include_roads)
     impervious_pct = (impervious_sqft / total_area_sqft * 100) if total_area_sqft > 0 else 0.0
     remaining_pct = max(0.0, impervious_cap_pct - impervious_pct)
     remaining_sqft = max(0.0, total_area_sqft * remaining_pct / 100)
@@ -0,0 +1,148 @@
+import json
+import math
+
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape
+
+# shapely array helpers shared by the vector and raster accounting engines and the tile pipeline
+
+# everything touching the user polygon gets grown by this before clipping, so shared edges still intersect
+CLIP_PAD_DEG = 0.000001
+
+# Default road widths in metres by highway type, used when OSM width tag is missing
+DEFAULT_ROAD_WIDTH_M: dict[str, float] = {
+    "motorway":     12.0,
+    "trunk":        10.0,
+    "primary":       8.0,
+    "secondary":     7.0,
+    "tertiary":      6.0,
+    "residential":   5.0,
+    "service":       4.0,
+    "living_street": 4.0,
+}
+DEFAULT_WIDTH_M = 5.0
+
+
+def area_scale(user_polygon) -> tuple[float, float]:
+    """(metres per degree at the polygon's latitude, sqft per degree²)"""
+    center_lat = user_polygon.centroid.y
+    meters_per_deg = 111320 * math.cos(math.radians(center_lat))
+    sqm_per_deg2 = meters_per_deg ** 2
+    return meters_per_deg, sqm_per_deg2 * 10.764
+
+
+def geoms_from_features(features: list[dict]) -> np.ndarray:
+    """Parse every feature geometry in one from_geojson call, None for anything unparseable"""
+    if not features:
+        return np.empty(0, dtype=object)
+    try:
+        return shapely.from_geojson([json.dumps(f["geometry"]) for f in features], on_invalid="ignore")
+    except Exception:
+        # one bad geometry shouldn't sink the batch, go one by one
+        return _each(lambda f: shape(f["geometry"]), features)
+
+
+def contours_to_polygons(contours, to_lng_lat, simplify_tolerance: float) -> np.ndarray:
+    """
+    All contours of one mask in a single pass: one affine transform over every point,
+    then build, fix and simplify the polygons as shapely arrays instead of one at a time
+    """
+    rings = [c for c in contours if len(c) >= 3]
+    if not rings:
+        return np.empty(0, dtype=object)
+
+    lengths = np.fromiter((len(c) for c in rings), dtype=np.intp, count=len(rings))
+    pixels = np.concatenate(rings).reshape(-1, 2).astype(np.float64)
+    coords = to_lng_lat(pixels)
+
+    # linearrings closes each ring for us
+    ring_index = np.repeat(np.arange(len(rings)), lengths)
+    polys = shapely.polygons(shapely.linearrings(coords, indices=ring_index))
+
+    # buffer(0) rather than make_valid, make_valid can hand back lines/collections that the response model rejects
+    invalid = ~shapely.is_valid(polys)
+    if invalid.any():
+        polys[invalid] = shapely.buffer(polys[invalid], 0)
+
+    polys = shapely.simplify(polys, simplify_tolerance)
+    return polys[~shapely.is_empty(polys)]
+
+
+def query_polygon(geoms: np.ndarray, user_polygon) -> tuple[np.ndarray, np.ndarray]:
+    """
+    STRtree pass over geoms (Nones allowed): sorted indices of anything within the 1e-6 clip
+    buffer of the polygon, and a mask over those hits for the ones sitting strictly inside it.
+    """
+    valid = np.flatnonzero(~shapely.is_missing(geoms)) if len(geoms) else np.empty(0, dtype=np.intp)
+    if len(valid) == 0:
+        return valid, np.zeros(0, dtype=bool)
+
+    tree = STRtree(geoms[valid])
+    try:
+        # same 1e-6 tolerance the per feature buffer uses, so nothing that used to touch gets dropped
+        hits = np.sort(tree.query(user_polygon.buffer(CLIP_PAD_DEG), predicate="intersects"))
+        inside = tree.query(user_polygon.buffer(-CLIP_PAD_DEG), predicate="contains_properly")
+    except Exception:
+        # invalid input geometry can make GEOS predicates throw, fall back to clipping everything
+        return valid, np.zeros(len(valid), dtype=bool)
+    return valid[hits], np.isin(hits, inside)
+
+
+def clip_to_polygon(geoms: np.ndarray, user_polygon) -> np.ndarray:
+    """
+    Clipped geometry per input, None where it misses the polygon (or breaks).
+    Features outside the polygon never get buffered or intersected, features fully
+    inside skip the intersection, the rest are buffered and intersected as one array.
+    """
+    clipped_geoms = np.full(len(geoms), None, dtype=object)
+    hits, inside = query_polygon(geoms, user_polygon)
+    if len(hits) == 0:
+        return clipped_geoms
+
+    try:
+        clipped = shapely.buffer(geoms[hits], CLIP_PAD_DEG, quad_segs=16)  # same segments as BaseGeometry.buffer
+        clipped[~inside] = shapely.intersection(clipped[~inside], user_polygon)
+    except Exception:
+        clipped = _each(
+            lambda pair: pair[0].buffer(CLIP_PAD_DEG) if pair[1] else pair[0].buffer(CLIP_PAD_DEG).intersection(user_polygon),
+            list(zip(geoms[hits], inside)),
+        )
+
+    clipped[~shapely.is_missing(clipped) & shapely.is_empty(clipped)] = None
+    clipped_geoms[hits] = clipped
+    return clipped_geoms
+
+
+def _road_widths_m(props: list[dict]) -> np.ndarray:
+    """Width per feature: OSM width tag, else the default for its highway type"""
+    return np.array(
+        [p.get("width_m") or DEFAULT_ROAD_WIDTH_M.get(p.get("road_type", ""), DEFAULT_WIDTH_M) for p in props],
+        dtype=np.float64,
+    )
+
+
+def buffer_lines(geoms: np.ndarray, props: list[dict], meters_per_deg: float, pad_deg: float = 0.0) -> np.ndarray:
+    """Lines buffered to their road width (+ pad_deg) in one array call, polygons and Nones passed through"""
+    out = geoms.copy()
+    lines = np.flatnonzero(np.isin(shapely.get_type_id(geoms), (1, 5)))  # LineString, MultiLineString
+    if len(lines) == 0:
+        return out
+    half_width_deg = _road_widths_m([props[i] for i in lines]) / 2 / meters_per_deg + pad_deg
+    try:
+        out[lines] = shapely.buffer(geoms[lines], half_width_deg, quad_segs=16)
+    except Exception:
+        out[lines] = _each(lambda pair: pair[0].buffer(pair[1]), list(zip(geoms[lines], half_width_deg)))
+    return out
+
+
+def _each(fn, items) -> np.ndarray:
+    """Per item fallback for when a whole-array GEOS call throws, failures become None"""
+    out = np.empty(len(items), dtype=object)
+    for i, item in enumerate(items):
+        try:
+            out[i] = fn(item)
+        except Exception:
+            out[i] = None
+    return out
@@ -0,0 +1,61 @@
+import asyncio
+from urllib.parse import urlsplit
+
+import httpx
+
+from services.metrics import UPSTREAM_RESPONSES
+
+# max in-flight requests per upstream host (host:port if it has one), shared by every /analyze
+# on this worker so one big parcel can't hog Mapbox or HF while other users wait
+HOST_CONCURRENCY: dict[str, int] = {
+    "api.mapbox.com": 32,
+    "router.huggingface.co": 8,
+}
+DEFAULT_HOST_CONCURRENCY = 4
+
+
+class UpstreamClient:
+    """
+    One pooled httpx.AsyncClient for the app lifetime (keep-alive + HTTP/2)
+    with a semaphore per upstream host in front of it.
+    """
+
+    def __init__(
+        self,
+        host_limits: dict[str, int] | None = None,
+        default_limit: int = DEFAULT_HOST_CONCURRENCY,
+    ):
+        self._client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=40, keepalive_expiry=30.0),
+        )
+        self._host_limits = HOST_CONCURRENCY if host_limits is None else host_limits
+        self._default_limit = default_limit
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self._host_limits.get(host, self._default_limit))
+        return self._semaphores[host]
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        # same key as the semaphores, two ports on one host are two upstreams
+        host = urlsplit(url).netloc
+        async with self._semaphore(url):
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                UPSTREAM_RESPONSES.labels(host, "error").inc()
+                raise
+        UPSTREAM_RESPONSES.labels(host, str(response.status_code)).inc()
+        return response
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
@@ -0,0 +1,114 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import REGISTRY
+
+# one process wide registry, served by GET /metrics. Under several uvicorn workers each worker has its own
+STAGE_SECONDS = Histogram(
+    "urban_doodle_stage_seconds",
+    "Time spent per pipeline stage (per tile for the tile stages)",
+    ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+ANALYSIS_TILES = Histogram(
+    "urban_doodle_analysis_tiles",
+    "Tiles processed per analysis",
+    buckets=(1, 2, 4, 9, 16, 25, 50, 100, 200),
+)
+ANALYSIS_FEATURES = Histogram(
+    "urban_doodle_analysis_features",
+    "Features per analysis going into the merge (tiles, osm) and coming out of it (final)",
+    ["stage"],
+    buckets=(10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+ANALYSIS_VERTICES = Histogram(
+    "urban_doodle_analysis_vertices",
+    "Vertices per analysis going into the merge (input) and coming out of it (final)",
+    ["stage"],
+    buckets=(1e3, 5e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6),
+)
+UPSTREAM_RESPONSES = Counter(
+    "urban_doodle_upstream_responses",
+    "Responses from Mapbox / HF / Overpass by host (host:port if it has one) and status code, status=error for transport failures",
+    ["host", "status"],
+)
+UPSTREAM_RETRIES = Counter(
+    "urban_doodle_upstream_retries",
+    "Requests sent again after a failure, slow response or 429",
+    ["upstream"],
+)
+
+# stage -> ms for the analysis running in this context, run_analysis sets it before starting tile tasks
+# so they (and the threads they hand off to) add to the same dict
+_timings: ContextVar[dict | None] = ContextVar("timings", default=None)
+
+
+def start_timings() -> dict[str, float]:
+    timings: dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+
+@contextmanager
+def timed(stage: str):
+    """Observe the block in STAGE_SECONDS and add it to the current analysis' timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed * 1000
+
+
+def count_vertices(features: list[dict]) -> int:
+    return sum(_count_coords(f["geometry"].get("coordinates")) for f in features)
+
+
+def _count_coords(coords) -> int:
+    if not coords:
+        return 0
+    first = coords[0]
+    if isinstance(first, (int, float)):
+        return 1
+    if isinstance(first[0], (int, float)):
+        return len(coords)
+    return sum(_count_coords(c) for c in coords)
+
+
+class CacheCollector:
+    """Hit/miss counters and hit ratio per DiskCache, read from cache.stats() at scrape time"""
+
+    def __init__(self, caches: dict):
+        self.caches = caches
+
+    def collect(self):
+        lookups = CounterMetricFamily(
+            "urban_doodle_cache_lookups", "Cache lookups by result", labels=["cache", "result"]
+        )
+        ratio = GaugeMetricFamily("urban_doodle_cache_hit_ratio", "Hits over lookups since start", labels=["cache"])
+        size = GaugeMetricFamily("urban_doodle_cache_bytes", "Payload bytes on disk", labels=["cache"])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            lookups.add_metric([name, "hit"], stats["hits"])
+            lookups.add_metric([name, "miss"], stats["misses"])
+            ratio.add_metric([name], stats["hit_ratio"])
+            size.add_metric([name], stats["bytes"])
+        yield lookups
+        yield ratio
+        yield size
+
+
+def register_caches(caches: dict) -> CacheCollector:
+    collector = CacheCollector(caches)
+    REGISTRY.register(collector)
+    return collector
+
+
+def unregister_caches(collector: CacheCollector) -> None:
+    REGISTRY.unregister(collector)
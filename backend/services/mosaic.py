@@ -0,0 +1,88 @@
+import math
+import os
+import tempfile
+
+import cv2
+import numpy as np
+from shapely.geometry import mapping
+
+from services.geometry import contours_to_polygons
+
+
+class MaskMosaic:
+    """
+    Per label masks of every tile in the analysis pasted into one raster, so it gets contoured once.
+    A tree crown or road crossing a tile edge comes out as one polygon instead of fragments that
+    clipping then has to buffer + union back together, and there are no seam slivers.
+    Labels past memmap_bytes live in a temp file instead of RAM, removed again on close().
+
+    All tiles have to be on the same zoom.
+    """
+
+    def __init__(self, tiles: list[dict], tile_size: int = 512, memmap_bytes: int = 256 * 1024 * 1024):
+        self.zoom = tiles[0]["zoom"]
+        self.tile_size = tile_size
+        self.x_min = min(t["x"] for t in tiles)
+        self.y_min = min(t["y"] for t in tiles)
+        self.cols = max(t["x"] for t in tiles) - self.x_min + 1
+        self.rows = max(t["y"] for t in tiles) - self.y_min + 1
+        self.shape = (self.rows * tile_size, self.cols * tile_size)
+        self.memmap_bytes = memmap_bytes
+        self._layers: dict[str, np.ndarray] = {}
+        self._files: list[str] = []
+
+    def add(self, tile: dict, masks: dict[str, np.ndarray]) -> None:
+        row = (tile["y"] - self.y_min) * self.tile_size
+        col = (tile["x"] - self.x_min) * self.tile_size
+        for label, mask in masks.items():
+            if mask is None or not np.any(mask):
+                continue
+            if mask.shape != (self.tile_size, self.tile_size):
+                mask = cv2.resize(mask, (self.tile_size, self.tile_size), interpolation=cv2.INTER_NEAREST)
+            self._layer(label)[row:row + self.tile_size, col:col + self.tile_size] = mask
+
+    def to_geojson(self, simplify_tolerance: float = 0.00001) -> list[dict]:
+        """Same features masks_to_geojson gives per tile, for the whole mosaic at once"""
+        features = []
+        for label, layer in self._layers.items():
+            contours, _ = cv2.findContours(layer, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            for poly in contours_to_polygons(contours, self._to_lng_lat, simplify_tolerance):
+                features.append({
+                    "type": "Feature",
+                    "geometry": dict(mapping(poly)),
+                    "properties": {
+                        "label": label,
+                    },
+                })
+        return features
+
+    def close(self) -> None:
+        self._layers.clear()
+        for path in self._files:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._files.clear()
+
+    def _layer(self, label: str) -> np.ndarray:
+        layer = self._layers.get(label)
+        if layer is None:
+            if self.shape[0] * self.shape[1] > self.memmap_bytes:
+                fd, path = tempfile.mkstemp(prefix="mosaic-", suffix=".u8")
+                os.close(fd)
+                self._files.append(path)
+                layer = np.memmap(path, dtype=np.uint8, mode="w+", shape=self.shape)
+            else:
+                layer = np.zeros(self.shape, dtype=np.uint8)
+            self._layers[label] = layer
+        return layer
+
+    def _to_lng_lat(self, pixels: np.ndarray) -> np.ndarray:
+        # columns are linear in longitude, rows go through web mercator so tall mosaics don't drift
+        n = 2 ** self.zoom
+        tile_x = self.x_min + pixels[:, 0] / self.tile_size
+        tile_y = self.y_min + pixels[:, 1] / self.tile_size
+        lng = tile_x / n * 360 - 180
+        lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * tile_y / n))))
+        return np.column_stack((lng, lat))
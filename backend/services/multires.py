@@ -0,0 +1,80 @@
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+
+from services.geometry import geoms_from_features
+from services.tile_fetcher import child_tiles
+
+# a quadrant that's empty, or this covered by a single label, looks the same at the fine zoom
+# and keeps its coarse features. Anything in between has edges worth refining
+UNIFORM_COVERAGE = 0.95
+
+
+def plan_refinement(
+    coarse: list[tuple[dict, list[dict]]],
+    user_polygon,
+    fine_zoom: int,
+    max_refine: int,
+) -> tuple[list[dict], list[dict], list[dict]]:
+    """
+    Second half of the multi resolution pass. Every coarse tile is split into its fine zoom children,
+    each child either gets refined (fetched + segmented again at fine_zoom) or keeps the coarse
+    features cropped to it. At most max_refine children are refined, the most mixed ones first.
+
+    coarse: (tile, features from process_tile) for every coarse tile
+    Returns (tiles to refine, coarse features kept for everything else, regions with the zoom each used)
+    """
+    candidates = []  # (priority, child, cropped coarse features, coarse zoom)
+    for tile, features in coarse:
+        children = child_tiles(tile, fine_zoom, polygon=user_polygon)
+        for child, (priority, cropped) in zip(children, _crop_to_children(features, children)):
+            candidates.append((priority, child, cropped, tile["zoom"]))
+
+    order = sorted(range(len(candidates)), key=lambda i: -candidates[i][0])  # stable, ties keep grid order
+    refine_ids = {i for i in order[:max_refine] if candidates[i][0] > 0}
+
+    refine, kept_features, regions = [], [], []
+    for i, (_, child, cropped, coarse_zoom) in enumerate(candidates):
+        if i in refine_ids:
+            refine.append(child)
+            regions.append({"zoom": fine_zoom, "bounds": child["bounds"]})
+        else:
+            kept_features.extend(cropped)
+            regions.append({"zoom": coarse_zoom, "bounds": child["bounds"]})
+    return refine, kept_features, regions
+
+
+def _crop_to_children(features: list[dict], children: list[dict]) -> list[tuple[float, list[dict]]]:
+    """
+    Per child: how much refining it would be worth (0 = empty or uniform) and the coarse features cropped to it
+    """
+    if not features:
+        return [(0.0, []) for _ in children]
+
+    geoms = geoms_from_features(features)
+    labels = np.array([f["properties"]["label"] for f in features])
+
+    results = []
+    for child in children:
+        box = shapely.box(*child["bounds"])
+        clipped = shapely.intersection(geoms, box)
+        # polygon/multipolygon only, a coarse shape that just touches the quadrant edge isn't in it
+        keep = np.isin(shapely.get_type_id(clipped), (3, 6)) & (shapely.area(clipped) > 0)
+        if not keep.any():
+            results.append((0.0, []))
+            continue
+
+        box_area = box.area
+        covered = shapely.union_all(clipped[keep]).area / box_area
+        largest_label = max(
+            shapely.union_all(clipped[keep & (labels == label)]).area / box_area
+            for label in np.unique(labels[keep])
+        )
+        priority = 0.0 if largest_label >= UNIFORM_COVERAGE else min(covered, 1 - largest_label)
+
+        cropped = [
+            {"type": "Feature", "geometry": dict(mapping(geom)), "properties": dict(features[i]["properties"])}
+            for i, geom in zip(np.flatnonzero(keep), clipped[keep])
+        ]
+        results.append((priority, cropped))
+    return results
@@ -1,21 +1,54 @@
-import time
+import asyncio
+import io
+import json
 import textwrap
-import httpx
-from shapely.geometry import Polygon, LineString, Point, mapping
-
-# Ordered list of public Overpass endpoints, incase it 429's
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import TYPE_CHECKING
+
+import numpy as np
+import shapely
+from shapely.geometry import Point, mapping
+
+from services.disk_cache import DiskCache
+from services.http_client import UpstreamClient
+from services.metrics import UPSTREAM_RETRIES
+from services.profiling import profiled
+from services.single_flight import SingleFlight
+from services.tile_fetcher import _lng_lat_to_tile, _tile_to_lng_lat
+
+try:
+    import ijson  # streams the Overpass response instead of loading the whole document
+except ImportError:
+    ijson = None
+
+# False when ijson isn't installed, responses then get loaded whole with json.loads. main logs it on startup
+STREAMING_PARSE = ijson is not None
+
+if TYPE_CHECKING:
+    from services.osm_store import OsmStore  # osm_store imports this module
+
+# Public Overpass endpoints, config order only breaks ties until we've seen how each one performs
 OVERPASS_ENDPOINTS = [
     "https://overpass-api.de/api/interpreter",
     "https://overpass.kumi.systems/api/interpreter",
     "https://maps.mail.ru/osm/tools/overpass/api/interpreter",
 ]
 
-# time to wait before trying the next endpoint after a 429
-RETRY_DELAYS = [5, 15, 30]
+# a mirror that 429'd goes to the back of the line for this long
+RATE_LIMIT_COOLDOWN_S = 30.0
+
+# hedging: if the best mirror hasn't answered by its p75 latency, ask the next one too
+HEDGE_PERCENTILE = 75
+DEFAULT_LATENCY_S = 4.0  # assumed until a mirror has a few samples
+MIN_HEDGE_DELAY_S = 1.0
+MAX_HEDGE_DELAY_S = 15.0
 
-#  bbox tuple to parsed feature list
-# cleared on server restart, prevents repeat Overpass calls for the same area
-_osm_cache: dict[str, list[dict]] = {}
+# OSM is cached in fixed web mercator cells at this zoom (~600m across), so a polygon that moves
+# a little or overlaps an earlier one still hits the same cells. Any bbox is a handful of cells
+OSM_CELL_ZOOM = 16
 
 MINOR_STRUCTURE_TYPES = {
     "garage", "garages", "shed", "carport", "hut", "roof",
@@ -23,6 +56,51 @@ MINOR_STRUCTURE_TYPES = {
 }
 
 
+class EndpointStats:
+    """
+    Rolling latency + failure record per Overpass mirror.
+    Decides which mirror gets asked first and how long to wait on it before hedging to the next.
+    """
+
+    def __init__(self, endpoints: list[str], window: int = 50):
+        self.endpoints = list(endpoints)
+        self._latencies = {e: deque(maxlen=window) for e in self.endpoints}
+        self._failure_rate = {e: 0.0 for e in self.endpoints}  # EWMA, 0 = always fine, 1 = always failing
+        self._cooldown_until = {e: 0.0 for e in self.endpoints}
+
+    def ranked(self) -> list[str]:
+        now = time.monotonic()
+
+        def score(endpoint):
+            samples = self._latencies[endpoint]
+            latency = float(np.median(samples)) if samples else DEFAULT_LATENCY_S
+            return (self._cooldown_until[endpoint] > now, latency * (1 + 4 * self._failure_rate[endpoint]))
+
+        return sorted(self.endpoints, key=score)  # stable, so config order breaks ties
+
+    def hedge_delay(self, endpoint: str) -> float:
+        samples = self._latencies[endpoint]
+        if len(samples) < 5:
+            return DEFAULT_LATENCY_S
+        return float(np.clip(np.percentile(samples, HEDGE_PERCENTILE), MIN_HEDGE_DELAY_S, MAX_HEDGE_DELAY_S))
+
+    def record_success(self, endpoint: str, latency_s: float) -> None:
+        self._latencies[endpoint].append(latency_s)
+        self._failure_rate[endpoint] *= 0.8
+
+    def record_failure(self, endpoint: str, rate_limited: bool = False) -> None:
+        self._failure_rate[endpoint] = self._failure_rate[endpoint] * 0.8 + 0.2
+        if rate_limited:
+            self._cooldown_until[endpoint] = time.monotonic() + RATE_LIMIT_COOLDOWN_S
+
+
+# shared by every request in the process, so one request's 429 steers the next away from that mirror
+OVERPASS_STATS = EndpointStats(OVERPASS_ENDPOINTS)
+
+# concurrent analyses over the same area share in-flight Overpass queries, keyed by z16 cell (or bbox without a cache)
+OSM_FLIGHTS = SingleFlight()
+
+
 def _parse_year(raw: str | None) -> int | None:
     if not raw:
         return None
@@ -85,20 +163,130 @@ def _surface_weight(surface: str | None, highway: str) -> float:
 
 
 
-def fetch_osm_features(bbox: tuple, timeout: int = 30) -> list[dict]:
+async def fetch_osm_features(
+    bbox: tuple,
+    http: UpstreamClient,
+    cache: DiskCache | None = None,
+    timeout: int = 30,
+    store: "OsmStore | None" = None,
+    overpass: EndpointStats | None = None,
+) -> list[dict]:
     """
-    Fetch buildings, roads, trees, and landuse in a single Overpass query.
-    Tries multiple public endpoints with delay-based fallback on 429.
-    Results are cached in-process by bbox to avoid repeat calls during a session.
+    Buildings, roads, trees and landuse for a bbox.
+    With a cache the bbox is answered from fixed z16 cells: cells already on disk are reused,
+    the missing ones are fetched together in a single Overpass query and stored for next time,
+    so overlapping or nearby analyses mostly never hit Overpass.
+    With a local OsmStore (ingested extract) Overpass and the cache are skipped entirely.
+    overpass: mirrors to query and their stats, OVERPASS_STATS (the public mirrors) by default.
 
     bbox: (west, south, east, north)
     Raises RuntimeError if all endpoints fail (caller surfaces this as HTTP 400).
     """
-    cache_key = str(bbox)
-    if cache_key in _osm_cache:
-        print(f"[OSM] Cache hit for bbox {bbox}")
-        return _osm_cache[cache_key]
+    if store is not None:
+        features = await asyncio.to_thread(store.query, bbox)
+        print(f"[OSM] {len(features)} features from local store for bbox {bbox}")
+        return features
+
+    if cache is None:
+        return await OSM_FLIGHTS.do(bbox, lambda: _query_overpass(bbox, http, timeout, overpass))
+
+    cells = _cells_for_bbox(bbox)
+    cached: dict[tuple, dict] = {}
+    for cell in cells:
+        data = await asyncio.to_thread(cache.get, _cell_cache_key(cell))
+        if data is not None:
+            cached[cell] = json.loads(zlib.decompress(data))
+
+    missing = [cell for cell in cells if cell not in cached]
+    print(f"[OSM] {len(cached)}/{len(cells)} cells cached for bbox {bbox}")
+
+    if missing:
+        async def fetch_cells(cells: list[tuple[int, int]]) -> dict[tuple, dict]:
+            # one query over all the missing cells, then split the answer back out per cell
+            features = await _query_overpass(_cells_bbox(cells), http, timeout, overpass)
+            fetched = await asyncio.to_thread(_split_into_cells, features, cells)
+            for cell, payload in fetched.items():
+                await asyncio.to_thread(cache.put, _cell_cache_key(cell), zlib.compress(json.dumps(payload).encode()))
+            return fetched
+
+        # cells another request is already fetching are waited on, not queried again
+        cached.update(await OSM_FLIGHTS.do_many(missing, fetch_cells))
+
+    return _combine_cells([cached[cell] for cell in cells], bbox)
 
+
+def _cells_for_bbox(bbox: tuple) -> list[tuple[int, int]]:
+    west, south, east, north = bbox
+    x_min, y_min = _lng_lat_to_tile(west, north, OSM_CELL_ZOOM)
+    x_max, y_max = _lng_lat_to_tile(east, south, OSM_CELL_ZOOM)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def _cell_bounds(cell: tuple[int, int]) -> tuple[float, float, float, float]:
+    x, y = cell
+    west, north = _tile_to_lng_lat(x, y, OSM_CELL_ZOOM)
+    east, south = _tile_to_lng_lat(x + 1, y + 1, OSM_CELL_ZOOM)
+    return west, south, east, north
+
+
+def _cells_bbox(cells: list[tuple[int, int]]) -> tuple[float, float, float, float]:
+    bounds = np.array([_cell_bounds(cell) for cell in cells])
+    return (bounds[:, 0].min(), bounds[:, 1].min(), bounds[:, 2].max(), bounds[:, 3].max())
+
+
+def _cell_cache_key(cell: tuple[int, int]) -> str:
+    return f"osm/{OSM_CELL_ZOOM}/{cell[0]}/{cell[1]}"
+
+
+def _feature_bounds(features: list[dict]) -> np.ndarray:
+    if not features:
+        return np.zeros((0, 4))
+    geoms = shapely.from_geojson([json.dumps(f["geometry"]) for f in features])
+    return shapely.bounds(geoms)
+
+
+def _split_into_cells(features: list[dict], cells: list[tuple[int, int]]) -> dict[tuple, dict]:
+    """Every feature goes to each cell its bounds touch, so a way crossing a cell edge is in both"""
+    bounds = _feature_bounds(features)
+    payloads = {}
+    for cell in cells:
+        west, south, east, north = _cell_bounds(cell)
+        hit = (
+            (bounds[:, 0] <= east) & (bounds[:, 2] >= west)
+            & (bounds[:, 1] <= north) & (bounds[:, 3] >= south)
+        )
+        idx = np.flatnonzero(hit)
+        payloads[cell] = {
+            "features": [features[i] for i in idx],
+            "bounds": bounds[idx].tolist(),
+        }
+    return payloads
+
+
+def _combine_cells(payloads: list[dict], bbox: tuple) -> list[dict]:
+    """Stitch neighbouring cells together, drop duplicates from cell edges and anything outside the bbox"""
+    west, south, east, north = bbox
+    seen: set[tuple] = set()
+    features = []
+    for payload in payloads:
+        for feature, (minx, miny, maxx, maxy) in zip(payload["features"], payload["bounds"]):
+            if minx > east or maxx < west or miny > north or maxy < south:
+                continue
+            key = (feature["properties"]["label"], feature["properties"]["osm_id"])
+            if key in seen:
+                continue
+            seen.add(key)
+            features.append(feature)
+    return features
+
+
+async def _query_overpass(
+    bbox: tuple, http: UpstreamClient, timeout: int = 30, overpass: EndpointStats | None = None
+) -> list[dict]:
+    """
+    Fetch buildings, roads, trees, and landuse in a single Overpass query.
+    Hedged across the mirrors in overpass (OVERPASS_STATS), see EndpointStats for how they're ordered.
+    """
     west, south, east, north = bbox
     query = textwrap.dedent(f"""
         [out:json][timeout:{timeout}];
@@ -113,88 +301,236 @@ def fetch_osm_features(bbox: tuple, timeout: int = 30) -> list[dict]:
         out skel qt;
     """)
 
+    stats = overpass or OVERPASS_STATS
+    ranked = stats.ranked()
+    hedge_delay = stats.hedge_delay(ranked[0])
+    attempts: dict[asyncio.Task, str] = {}
     last_err: Exception | None = None
-    for attempt, endpoint in enumerate(OVERPASS_ENDPOINTS):
-        try:
-            print(f"[OSM] Attempt {attempt + 1}/{len(OVERPASS_ENDPOINTS)} → {endpoint}")
-            response = httpx.post(
-                endpoint,
-                data={"data": query},
-                timeout=float(timeout + 5),
+
+    def launch() -> asyncio.Task:
+        endpoint = ranked[len(attempts)]
+        print(f"[OSM] Attempt {len(attempts) + 1}/{len(ranked)} → {endpoint}")
+        if attempts:
+            UPSTREAM_RETRIES.labels("overpass").inc()
+        task = asyncio.create_task(_post_overpass(endpoint, query, http, timeout, stats))
+        attempts[task] = endpoint
+        return task
+
+    # best mirror first, then the next one whenever the last fails or the current ones are slow.
+    # first good answer wins, everything still running gets cancelled
+    pending = {launch()}
+    try:
+        while pending:
+            can_hedge = len(attempts) < len(ranked)
+            done, pending = await asyncio.wait(
+                pending,
+                timeout=hedge_delay if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
             )
-            if response.status_code == 429:
-                delay = RETRY_DELAYS[attempt] if attempt < len(RETRY_DELAYS) else 30
-                print(f"[OSM] 429 rate-limited by {endpoint}, waiting {delay}s before next endpoint")
-                time.sleep(delay)
+            if not done:
+                print(f"[OSM] No answer after {hedge_delay:.1f}s, hedging")
+                pending.add(launch())
                 continue
-            response.raise_for_status()
-        except Exception as e:
-            last_err = e
-            print(f"[OSM] Error from {endpoint}: {e}")
-            continue
-
-        features = _parse_response(response.json())
-        _osm_cache[cache_key] = features
-        print(f"[OSM] Success: {len(features)} features from {endpoint}")
-        return features
+
+            for task in done:
+                endpoint = attempts[task]
+                try:
+                    response = task.result()
+                except Exception as e:
+                    last_err = e
+                    print(f"[OSM] Error from {endpoint}: {e}")
+                    continue
+
+                # parsing a dense bbox takes a while, don't stall other requests on the loop
+                features = await asyncio.to_thread(profiled, _parse_response, response.content)
+                print(f"[OSM] Success: {len(features)} features from {endpoint}")
+                return features
+
+            # every finished attempt failed, don't wait out the hedge delay for the next mirror
+            if len(attempts) < len(ranked):
+                pending.add(launch())
+    finally:
+        for task in attempts:
+            task.cancel()
 
     raise RuntimeError(
-        f"Overpass API unavailable after {len(OVERPASS_ENDPOINTS)} attempts. "
+        f"Overpass API unavailable after {len(attempts)} attempts. "
         f"Last error: {last_err}. Try again in a few minutes."
     )
 
 
-def _parse_response(data: dict) -> list[dict]:
+async def _post_overpass(endpoint: str, query: str, http: UpstreamClient, timeout: int, stats: EndpointStats):
+    """One attempt against one mirror, feeds its stats either way"""
+    start = time.monotonic()
+    try:
+        response = await http.post(endpoint, data={"data": query}, timeout=float(timeout + 5))
+        if response.status_code != 429:
+            response.raise_for_status()
+    except Exception:  # CancelledError isn't one, losing the race says nothing about the mirror
+        stats.record_failure(endpoint)
+        raise
+
+    if response.status_code == 429:
+        stats.record_failure(endpoint, rate_limited=True)
+        raise RuntimeError(f"429 rate-limited by {endpoint}")
+    stats.record_success(endpoint, time.monotonic() - start)
+    return response
+
+
+def _parse_response(content: bytes) -> list[dict]:
     """Parse raw Overpass JSON into GeoJSON feature dicts."""
-    nodes = {
-        el["id"]: (el["lon"], el["lat"])
-        for el in data.get("elements", [])
-        if el["type"] == "node"
-    }
+    return _features_from_elements(_read_elements(content))
+
+
+def _features_from_elements(elements: list[tuple[dict, np.ndarray | None]]) -> list[dict]:
+    """(element, coords) pairs from _read_elements or the local store to feature dicts"""
+    valid = _ring_validity(elements)
 
     features = []
-    for el in data.get("elements", []):
-        tags = el.get("tags", {})
-
-        if el["type"] == "way":
-            has_building = bool(tags.get("building"))
-            has_highway = bool(tags.get("highway"))
-            has_landuse = bool(tags.get("landuse"))
-
-            if has_building:
-                feature = _process_building(el, tags, nodes)
-                if feature:
-                    features.append(feature)
-            elif has_highway:
-                feature = _process_road(el, tags, nodes)
-                if feature:
-                    features.append(feature)
-            elif has_landuse:
-                feature = _process_landuse(el, tags, nodes)
-                if feature:
-                    features.append(feature)
-
-        elif el["type"] == "node" and tags.get("natural") == "tree":
-            feature = _process_tree(el, tags)
-            if feature:
-                features.append(feature)
+    for (el, coords), is_valid in zip(elements, valid):
+        feature = _element_to_feature(el, coords, is_valid)
+        if feature:
+            features.append(feature)
 
     return features
 
 
-def _process_building(el: dict, tags: dict, nodes: dict) -> dict | None:
-    coords = [nodes[nid] for nid in el.get("nodes", []) if nid in nodes]
+def _ring_validity(elements: list[tuple[dict, np.ndarray | None]]) -> list[bool | None]:
+    """
+    is_valid for every way that could become a polygon, in one shapely call instead of one per way.
+    None where it wasn't checked, _polygon_geometry works it out itself then.
+    """
+    valid: list[bool | None] = [None] * len(elements)
+    candidates = [
+        i for i, (el, coords) in enumerate(elements)
+        if coords is not None and len(coords) >= 4
+        and (el["tags"].get("building") or el["tags"].get("landuse"))
+    ]
+    if not candidates:
+        return valid
+
+    coords = np.concatenate([elements[i][1] for i in candidates])
+    ring_index = np.repeat(np.arange(len(candidates)), [len(elements[i][1]) for i in candidates])
+    try:
+        # linearrings closes any open ring, same as Polygon(coords)
+        checked = shapely.is_valid(shapely.polygons(shapely.linearrings(coords, indices=ring_index)))
+    except Exception:
+        return valid  # a degenerate ring somewhere, fall back to checking one by one
+
+    for i, ok in zip(candidates, checked.tolist()):
+        valid[i] = ok
+    return valid
+
+
+def _iter_elements(source):
+    """Overpass elements one at a time, source is the raw bytes or a binary file"""
+    if ijson is not None:
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        return ijson.items(source, "elements.item", use_float=True)
+
+    data = json.loads(source) if isinstance(source, (bytes, bytearray, str)) else json.load(source)
+    return data.get("elements", [])
+
+
+def _read_elements(source) -> list[tuple[dict, np.ndarray | None]]:
+    """
+    Tagged ways paired with their (lon, lat) coords, plus tagged nodes (coords None).
+    Untagged nodes never become dicts we keep, their ids/coords go into flat arrays that are
+    sorted once, and every way's node refs are resolved in a single searchsorted.
+    Refs to nodes that aren't in the response are dropped, like before.
+    """
+    node_ids, node_lon, node_lat = array("q"), array("d"), array("d")
+    refs, offsets = array("q"), [0]
+    kept: list[dict] = []  # document order, the way's slot in offsets is kept alongside
+    way_slots: list[int] = []
+
+    for el in _iter_elements(source):
+        if el["type"] == "node":
+            if "lon" in el and "lat" in el:
+                node_ids.append(el["id"])
+                node_lon.append(el["lon"])
+                node_lat.append(el["lat"])
+            if el.get("tags"):
+                kept.append(el)
+                way_slots.append(-1)
+        elif el["type"] == "way" and el.get("tags"):
+            way_slots.append(len(offsets) - 1)
+            refs.extend(el.pop("nodes", []))
+            offsets.append(len(refs))
+            kept.append(el)
+
+    ids = np.frombuffer(node_ids, dtype=np.int64)
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    lon_lat = np.column_stack([np.frombuffer(node_lon)[order], np.frombuffer(node_lat)[order]])
+
+    refs = np.frombuffer(refs, dtype=np.int64)
+    if len(ids):
+        pos = np.minimum(np.searchsorted(ids, refs), len(ids) - 1)
+        found = ids[pos] == refs
+    else:
+        pos, found = np.zeros(len(refs), dtype=np.intp), np.zeros(len(refs), dtype=bool)
+    # drop unresolved refs once up front, each way is then a plain slice
+    resolved = lon_lat[pos[found]] if len(ids) else np.empty((0, 2))
+    bounds = np.concatenate([[0], np.cumsum(found)])[offsets]
+
+    elements: list[tuple[dict, np.ndarray | None]] = []
+    for el, slot in zip(kept, way_slots):
+        if slot < 0:
+            elements.append((el, None))
+        else:
+            elements.append((el, resolved[bounds[slot]:bounds[slot + 1]]))
+    return elements
+
+
+def _element_to_feature(el: dict, coords: np.ndarray | None, is_valid: bool | None = None) -> dict | None:
+    """
+    One Overpass element (way or tree node) to a feature, None for anything we don't track.
+    is_valid is the ring's validity when the caller already knows it (see _ring_validity).
+    """
+    tags = el.get("tags", {})
+
+    if el["type"] == "way":
+        if tags.get("building"):
+            return _process_building(el, tags, coords, is_valid)
+        if tags.get("highway"):
+            return _process_road(el, tags, coords)
+        if tags.get("landuse"):
+            return _process_landuse(el, tags, coords, is_valid)
+
+    elif el["type"] == "node" and tags.get("natural") == "tree":
+        return _process_tree(el, tags)
+
+    return None
+
+
+def _polygon_geometry(coords: np.ndarray, is_valid: bool | None = None) -> dict | None:
+    """
+    GeoJSON polygon for a closed way, same output as mapping(Polygon(coords)).
+    Most OSM rings are already valid, those skip the shapely object + mapping round trip.
+    """
     if len(coords) < 4:
         return None
 
     try:
-        poly = Polygon(coords)
-        if not poly.is_valid:
-            poly = poly.buffer(0)
+        ring = coords if (coords[0] == coords[-1]).all() else np.vstack([coords, coords[:1]])
+        if is_valid is None:
+            is_valid = shapely.is_valid(shapely.polygons(ring))
+        if is_valid:
+            return {"type": "Polygon", "coordinates": (tuple(map(tuple, ring.tolist())),)}
+        poly = shapely.polygons(ring).buffer(0)
         if poly.is_empty:
             return None
     except Exception:
         return None
+    return dict(mapping(poly))
+
+
+def _process_building(el: dict, tags: dict, coords: np.ndarray, is_valid: bool | None = None) -> dict | None:
+    geometry = _polygon_geometry(coords, is_valid)
+    if geometry is None:
+        return None
 
     building_type = tags.get("building", "yes").lower()
     is_minor = building_type in MINOR_STRUCTURE_TYPES
@@ -212,7 +548,7 @@ def _process_building(el: dict, tags: dict, nodes: dict) -> dict | None:
 
     return {
         "type": "Feature",
-        "geometry": dict(mapping(poly)),
+        "geometry": geometry,
         "properties": {
             "label": "building",
             "osm_id": el["id"],
@@ -229,22 +565,14 @@ def _process_building(el: dict, tags: dict, nodes: dict) -> dict | None:
     }
 
 
-def _process_road(el: dict, tags: dict, nodes: dict) -> dict | None:
+def _process_road(el: dict, tags: dict, coords: np.ndarray) -> dict | None:
     highway = tags.get("highway", "").lower()
     if not highway or highway in SKIP_HIGHWAY_TYPES:
         return None
 
-    coords = [nodes[nid] for nid in el.get("nodes", []) if nid in nodes]
     if len(coords) < 2:
         return None
 
-    try:
-        line = LineString(coords)
-        if line.is_empty:
-            return None
-    except Exception:
-        return None
-
     surface = tags.get("surface", "").lower() or None
     weight = _surface_weight(surface, highway)
 
@@ -258,7 +586,7 @@ def _process_road(el: dict, tags: dict, nodes: dict) -> dict | None:
 
     return {
         "type": "Feature",
-        "geometry": dict(mapping(line)),
+        "geometry": {"type": "LineString", "coordinates": tuple(map(tuple, coords.tolist()))},
         "properties": {
             "label": "road",
             "osm_id": el["id"],
@@ -271,24 +599,15 @@ def _process_road(el: dict, tags: dict, nodes: dict) -> dict | None:
     }
 
 
-def _process_landuse(el: dict, tags: dict, nodes: dict) -> dict | None:
+def _process_landuse(el: dict, tags: dict, coords: np.ndarray, is_valid: bool | None = None) -> dict | None:
     """Process a landuse way into a polygon feature."""
-    coords = [nodes[nid] for nid in el.get("nodes", []) if nid in nodes]
-    if len(coords) < 4:
-        return None
-
-    try:
-        poly = Polygon(coords)
-        if not poly.is_valid:
-            poly = poly.buffer(0)
-        if poly.is_empty:
-            return None
-    except Exception:
+    geometry = _polygon_geometry(coords, is_valid)
+    if geometry is None:
         return None
 
     return {
         "type": "Feature",
-        "geometry": dict(mapping(poly)),
+        "geometry": geometry,
         "properties": {
             "label": "landuse",
             "osm_id": el["id"],
@@ -0,0 +1,208 @@
+"""
+Local OSM store for production, so bbox lookups don't depend on public Overpass mirrors.
+
+Ingest a regional extract once (Overpass JSON dump, or .osm.pbf with pyosmium installed):
+    python -m services.osm_store ingest texas.osm.pbf --db osm_store.sqlite
+then set OSM_STORE_PATH=osm_store.sqlite and fetch_osm_features answers from it.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from services.osm_fetcher import _features_from_elements, _read_elements
+
+# only what fetch_osm_features' Overpass query asks for
+WAY_TAGS = ("building", "highway", "landuse")
+
+
+class OsmStore:
+    """
+    Ways (buildings, roads, landuse) and tree nodes in SQLite with an R-tree over their bounds.
+    Each way keeps its resolved coords so the Overpass _process_* logic runs unchanged at query time.
+    """
+
+    def __init__(self, path: str, create: bool = False):
+        """
+        Read only unless create, so a mistyped OSM_STORE_PATH fails at startup instead of
+        quietly serving an empty store. Only the ingest CLI creates / writes one
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        if not create:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"OSM store {path} not found, ingest an extract into it first")
+            self._conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            return
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS elements (
+                rowid    INTEGER PRIMARY KEY,
+                type     TEXT NOT NULL,
+                id       INTEGER NOT NULL,
+                tags     TEXT NOT NULL,
+                coords   BLOB NOT NULL,
+                UNIQUE (type, id)
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS elements_rtree USING rtree(
+                rowid, min_lon, max_lon, min_lat, max_lat
+            );
+            """
+        )
+
+    def query(self, bbox: tuple) -> list[dict]:
+        """Same feature dicts fetch_osm_features returns from Overpass, for anything whose bounds touch bbox"""
+        west, south, east, north = bbox
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT e.type, e.id, e.tags, e.coords
+                FROM elements_rtree r JOIN elements e ON e.rowid = r.rowid
+                WHERE r.min_lon <= ? AND r.max_lon >= ? AND r.min_lat <= ? AND r.max_lat >= ?
+                """,
+                (east, west, north, south),
+            ).fetchall()
+
+        elements = []
+        for el_type, el_id, tags, coords in rows:
+            coords = np.frombuffer(coords, dtype=np.float64).reshape(-1, 2)
+            el = {"type": el_type, "id": el_id, "tags": json.loads(tags)}
+
+            if el_type == "node":
+                el["lon"], el["lat"] = coords[0].tolist()
+                elements.append((el, None))
+            else:
+                elements.append((el, coords))
+        return _features_from_elements(elements)
+
+    def _insert(self, rows: list[tuple]) -> None:
+        """rows: (type, id, tags, coords array Nx2)"""
+        with self._lock, self._conn:
+            for el_type, el_id, tags, coords in rows:
+                values = (json.dumps(tags), np.asarray(coords, dtype=np.float64).tobytes())
+                # re-ingesting updates in place, INSERT OR REPLACE would give the element a new rowid
+                # and leave the old one behind in the R-tree
+                existing = self._conn.execute(
+                    "SELECT rowid FROM elements WHERE type = ? AND id = ?", (el_type, el_id)
+                ).fetchone()
+                if existing is not None:
+                    rowid = existing[0]
+                    self._conn.execute("UPDATE elements SET tags = ?, coords = ? WHERE rowid = ?", (*values, rowid))
+                else:
+                    rowid = self._conn.execute(
+                        "INSERT INTO elements (type, id, tags, coords) VALUES (?, ?, ?, ?)", (el_type, el_id, *values)
+                    ).lastrowid
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO elements_rtree (rowid, min_lon, max_lon, min_lat, max_lat) VALUES (?, ?, ?, ?, ?)",
+                    (rowid, coords[:, 0].min(), coords[:, 0].max(), coords[:, 1].min(), coords[:, 1].max()),
+                )
+
+    def ingest_overpass_json(self, path: str, batch_size: int = 10000) -> int:
+        """A saved Overpass `out body; >; out skel qt;` response, same shape the live query returns"""
+        with open(path, "rb") as f:
+            elements = _read_elements(f)
+
+        count = 0
+        batch = []
+        for el, coords in elements:
+            row = _element_row(el, coords)
+            if row is None:
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                self._insert(batch)
+                count += len(batch)
+                batch = []
+        self._insert(batch)
+        return count + len(batch)
+
+    def ingest_pbf(self, path: str, batch_size: int = 10000) -> int:
+        """Regional .osm.pbf extract (Geofabrik etc), needs pyosmium for the node location index"""
+        try:
+            import osmium
+        except ImportError as e:
+            raise RuntimeError("PBF ingestion needs pyosmium, pip install osmium") from e
+
+        store = self
+
+        class Handler(osmium.SimpleHandler):
+            def __init__(self):
+                super().__init__()
+                self.batch = []
+                self.count = 0
+
+            def _add(self, row):
+                self.batch.append(row)
+                if len(self.batch) >= batch_size:
+                    self.flush()
+
+            def flush(self):
+                store._insert(self.batch)
+                self.count += len(self.batch)
+                self.batch = []
+
+            def node(self, n):
+                if n.tags.get("natural") == "tree" and n.location.valid():
+                    el = {"type": "node", "id": n.id, "lon": n.location.lon, "lat": n.location.lat, "tags": dict(n.tags)}
+                    self._add(_element_row(el, None))
+
+            def way(self, w):
+                if not any(k in w.tags for k in WAY_TAGS):
+                    return
+                coords = np.array([(nd.lon, nd.lat) for nd in w.nodes if nd.location.valid()]).reshape(-1, 2)
+                el = {"type": "way", "id": w.id, "tags": dict(w.tags)}
+                row = _element_row(el, coords)
+                if row is not None:
+                    self._add(row)
+
+        handler = Handler()
+        handler.apply_file(path, locations=True)
+        handler.flush()
+        return handler.count
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _element_row(el: dict, coords: np.ndarray | None) -> tuple | None:
+    tags = el.get("tags", {})
+
+    if el["type"] == "node":
+        if tags.get("natural") != "tree" or "lon" not in el:
+            return None
+        return ("node", el["id"], tags, np.array([[el["lon"], el["lat"]]]))
+
+    if el["type"] != "way" or not any(tags.get(k) for k in WAY_TAGS):
+        return None
+    if coords is None or len(coords) < 2:
+        return None
+    return ("way", el["id"], tags, coords)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Ingest an OSM extract into the local OSM store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest = sub.add_parser("ingest", help=".osm.pbf extract or saved Overpass JSON dump")
+    ingest.add_argument("extract")
+    ingest.add_argument("--db", default=os.getenv("OSM_STORE_PATH", "osm_store.sqlite"))
+    args = parser.parse_args()
+
+    start = time.time()
+    store = OsmStore(args.db, create=True)
+    if args.extract.endswith(".pbf"):
+        count = store.ingest_pbf(args.extract)
+    else:
+        count = store.ingest_overpass_json(args.extract)
+    store.close()
+    print(f"[OSM store] {count} elements from {args.extract} into {args.db} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
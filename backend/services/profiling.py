@@ -0,0 +1,107 @@
+import cProfile
+import io
+import marshal
+import pstats
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+
+
+class RequestProfile:
+    """
+    cProfile of one /analyze plus the inputs it ran on, so a slow parcel can be looked at
+    without needing the live tiles and OSM data it had at the time.
+    Only worker thread work gets profiled (contouring, Overpass parsing, merge, accounting),
+    the event loop is shared with every other request so a profile of it would mix them all in.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.created = time.time()
+        self.inputs: dict = {}
+        self.status = "running"  # -> "complete" / "error: ..."
+        self._stats: pstats.Stats | None = None
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+    def skip(self) -> None:
+        with self._lock:
+            self.inputs["profiler_skipped"] = self.inputs.get("profiler_skipped", 0) + 1
+
+    def report(self, limit: int = 40, sort: str = "cumulative") -> str:
+        with self._lock:
+            if self._stats is None:
+                return ""
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+            return out.getvalue()
+
+    def pstats_bytes(self) -> bytes:
+        """Same bytes Stats.dump_stats writes, loads into pstats / snakeviz"""
+        with self._lock:
+            return marshal.dumps(self._stats.stats if self._stats is not None else {})
+
+
+# profile of the request running in this context, tasks and to_thread workers inherit it
+_active: ContextVar[RequestProfile | None] = ContextVar("profile", default=None)
+
+# from 3.12 cProfile sits on sys.monitoring, which takes one profiler per process, so profiled
+# calls run one at a time. Only debug requests ever take it
+_profiler_lock = threading.Lock()
+
+
+def activate(profile: RequestProfile | None) -> None:
+    """Profile everything run through profiled() from this context on, None leaves it off"""
+    _active.set(profile)
+
+
+def record(key: str, value) -> None:
+    """Save an intermediate input on the current profile, no-op when the request isn't profiled"""
+    profile = _active.get()
+    if profile is not None:
+        profile.inputs[key] = value
+
+
+def profiled(fn, *args, **kwargs):
+    """fn(*args, **kwargs), under cProfile if the current request is being profiled. Meant for to_thread"""
+    profile = _active.get()
+    if profile is None:
+        return fn(*args, **kwargs)
+    with _profiler_lock:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # something outside this module is already profiling the process, run it uncaptured
+            profile.skip()
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+            profile.add(profiler)
+
+
+class ProfileStore:
+    """Last max_entries profiles in memory, oldest fall out first. Cleared on restart"""
+
+    def __init__(self, max_entries: int = 20):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, RequestProfile] = OrderedDict()
+
+    def put(self, profile: RequestProfile) -> None:
+        self._entries[profile.id] = profile
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, profile_id: str) -> RequestProfile | None:
+        return self._entries.get(profile_id)
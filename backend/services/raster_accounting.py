@@ -0,0 +1,320 @@
+import math
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+
+from services.geo_converter import (
+    CATEGORY_COLORS,
+    DEMOLITION_LABELS,
+    ROAD_LABELS,
+    ClippedLayers,
+)
+from services.geometry import (
+    CLIP_PAD_DEG,
+    area_scale,
+    buffer_lines,
+    clip_to_polygon,
+    contours_to_polygons,
+    geoms_from_features,
+)
+
+# fillPoly takes fixed point coords, 3 fractional bits keeps edges subpixel accurate
+SHIFT = 3
+CROSS = cv2.getStructuringElement(cv2.MORPH_CROSS, (3, 3))
+
+
+@dataclass
+class RasterLayers(ClippedLayers):
+    """
+    ClippedLayers where every area comes from counting pixels on one grid over the polygon.
+    A pixel belongs to a category once, so a road under tree canopy or a segmentation "road"
+    on top of an OSM road isn't counted twice. Masks are kept bit packed for recomputes,
+    road surface weights as one packed mask per weight.
+    """
+    shape: tuple[int, int] = (0, 0)
+    pixel_sqft: float = 0.0
+    origin: tuple[float, float] = (0.0, 0.0)  # (west, north)
+    pixel_deg: float = 0.0
+    label_masks: dict[str, np.ndarray] = field(default_factory=dict)
+    road_weight_masks: dict[int, np.ndarray] = field(default_factory=dict)  # weight % -> pixels at that weight
+    _impervious: dict[tuple, float] = field(default_factory=dict, repr=False)
+
+    def category_union(self, labels: tuple[str, ...]) -> tuple[object, dict, float]:
+        if labels not in self._category_unions:
+            mask = self._union(labels)
+            # a single label was already traced in raster_clip_features
+            merged = self.label_geoms[labels[0]] if len(labels) == 1 else self._vectorize(mask)
+            self._category_unions[labels] = (merged, dict(mapping(merged)), _area_px(mask) * self.pixel_sqft)
+        return self._category_unions[labels]
+
+    def impervious_sqft(self, labels: tuple[str, ...], include_roads: bool) -> float:
+        # per pixel max(segmentation impervious, road surface weight), overlaps count once
+        key = (labels, include_roads)
+        if key not in self._impervious:
+            covered = self._union(labels).astype(np.uint8) * 100
+            if include_roads:
+                for pct, packed in self.road_weight_masks.items():
+                    covered = np.maximum(covered, self._unpack(packed).astype(np.uint8) * pct)
+            self._impervious[key] = _area_px(covered) / 100 * self.pixel_sqft
+        return self._impervious[key]
+
+    def _union(self, labels: tuple[str, ...]) -> np.ndarray:
+        mask = np.zeros(self.shape, dtype=bool)
+        for label in labels:
+            mask |= self._unpack(self.label_masks[label])
+        return mask
+
+    def _unpack(self, packed: np.ndarray) -> np.ndarray:
+        n = self.shape[0] * self.shape[1]
+        return np.unpackbits(packed, count=n).reshape(self.shape).astype(bool)
+
+    def _vectorize(self, mask: np.ndarray):
+        return _mask_to_geometry(mask, self.origin, self.pixel_deg)
+
+
+def raster_clip_features(
+    all_features: list[dict],
+    user_polygon,
+    resolution_m: float = 0.3,
+    max_pixels: int = 16_000_000,
+) -> RasterLayers:
+    """
+    Raster counterpart of clip_features. Everything is burned into a grid of resolution_m
+    pixels over the polygon bounds (coarser if that would pass max_pixels), areas are pixel counts.
+    Display geometry is traced back out of the rasters, so no big unions or intersections.
+    """
+    meters_per_deg, sqft_per_deg2 = area_scale(user_polygon)
+    west, south, east, north = user_polygon.bounds
+
+    # square pixels in the same degree space area_scale converts from, so totals line up with the vector engine
+    pixel_deg = resolution_m / meters_per_deg
+    width = max(1, math.ceil((east - west) / pixel_deg))
+    height = max(1, math.ceil((north - south) / pixel_deg))
+    if width * height > max_pixels:
+        scale = math.sqrt(width * height / max_pixels)
+        pixel_deg *= scale
+        width = max(1, math.ceil((east - west) / pixel_deg))
+        height = max(1, math.ceil((north - south) / pixel_deg))
+    shape = (height, width)
+    grid = _Grid(west, north, pixel_deg, shape)
+
+    layers = RasterLayers(
+        sqft_per_deg2=sqft_per_deg2,
+        shape=shape,
+        pixel_sqft=pixel_deg * pixel_deg * sqft_per_deg2,
+        origin=(west, north),
+        pixel_deg=pixel_deg,
+    )
+    inside = grid.fill([user_polygon]).astype(bool)
+
+    demolition_raw, road_raw, landuse_raw, other_features = [], [], [], []
+    for f in all_features:
+        label = f["properties"].get("label")
+        if label in DEMOLITION_LABELS:
+            demolition_raw.append(f)
+        elif label in ROAD_LABELS and f["properties"].get("road_type"):
+            road_raw.append(f)
+        elif label == "landuse":
+            landuse_raw.append(f)
+        else:
+            other_features.append(f)
+
+    # buildings: one id raster, per building area is a bincount over the pixels inside the polygon.
+    # popups still want each building's own outline, that clip is a single array op
+    building_clipped = clip_to_polygon(geoms_from_features(demolition_raw), user_polygon)
+    kept = np.flatnonzero(~shapely.is_missing(building_clipped))
+    ids = np.zeros(shape, dtype=np.int32)
+    for n, i in enumerate(kept, start=1):
+        grid.burn(ids, building_clipped[i], n)
+    ids[~inside] = 0
+    edge = _edges(ids)
+    counts = np.bincount(ids.ravel(), minlength=len(kept) + 1)[1:] - np.bincount(ids[edge], minlength=len(kept) + 1)[1:] / 2
+
+    layers.buildings = [
+        {"geometry": dict(mapping(building_clipped[i])), "props": demolition_raw[i]["properties"]}
+        for i in kept
+    ]
+    props = [b["props"] for b in layers.buildings]
+    layers.building_area_sqft = counts * layers.pixel_sqft
+    layers.building_levels = np.array([p.get("building_levels") or 1 for p in props], dtype=np.float64)
+    materials = [(p.get("building_material") or "").lower() for p in props]
+    layers.building_materials = sorted(set(materials))
+    material_index = {m: i for i, m in enumerate(layers.building_materials)}
+    layers.building_material_codes = np.array([material_index[m] for m in materials], dtype=np.intp)
+    layers.building_hazmat = np.array([bool(p.get("is_hazmat")) for p in props], dtype=bool)
+    layers.building_minor = np.array([bool(p.get("is_minor", False)) for p in props], dtype=bool)
+
+    # roads: the same buffers as the vector engine, filled lowest surface weight first so a pixel keeps the highest.
+    # filled polygons rather than thick lines, so the width holds at any resolution. CLIP_PAD_DEG is
+    # the 0.000001 every clipped geometry gets in the vector engine, it's ~4% of a 5m road
+    weight_pct = np.zeros(shape, dtype=np.uint8)
+    order = sorted(range(len(road_raw)), key=lambda i: road_raw[i]["properties"].get("road_surface_weight", 1.0))
+    road_props = [road_raw[i]["properties"] for i in order]
+    road_geoms = buffer_lines(
+        geoms_from_features([road_raw[i] for i in order]), road_props, meters_per_deg, pad_deg=CLIP_PAD_DEG
+    )
+    for props, geom in zip(road_props, road_geoms):
+        if geom is not None:
+            grid.burn(weight_pct, geom, int(round(props.get("road_surface_weight", 1.0) * 100)))
+    weight_pct[~inside] = 0
+    road_any = (weight_pct > 0).astype(np.uint8)
+    layers.road_weight_masks = {
+        int(pct): np.packbits((weight_pct == pct).ravel()) for pct in np.unique(weight_pct) if pct
+    }
+    layers.road_weighted_sqft = _area_px(weight_pct) / 100 * layers.pixel_sqft
+
+    merged_roads = _mask_to_geometry(road_any, layers.origin, pixel_deg)
+    # no feature rather than an empty one carrying an area
+    if not merged_roads.is_empty:
+        layers.road_feature = {
+            "type": "Feature",
+            "geometry": dict(mapping(merged_roads)),
+            "properties": {
+                "category": "impervious",
+                "area_sqft": _area_px(road_any) * layers.pixel_sqft,
+                "color": CATEGORY_COLORS["impervious"],
+            },
+        }
+
+    # everything else per label, kept as packed bits, categories are ORed together in account_features.
+    # OSM tree points have no area to burn, same as their 1e-6 buffers in the vector engine
+    # lines get buffered to their width like roads
+    by_label: dict[str, list] = {}
+    other_props = [f["properties"] for f in other_features]
+    other_geoms = _pad(buffer_lines(geoms_from_features(other_features), other_props, meters_per_deg, pad_deg=CLIP_PAD_DEG))
+    for props, geom in zip(other_props, other_geoms):
+        if geom is not None:
+            by_label.setdefault(props.get("label", ""), []).append(geom)
+
+    for label, geoms in by_label.items():
+        mask = grid.fill(geoms).astype(bool) & inside
+        merged = _mask_to_geometry(mask, layers.origin, pixel_deg)
+        # nothing on screen means nothing counted, same as a label the vector clip leaves empty
+        if merged.is_empty:
+            continue
+        layers.label_masks[label] = np.packbits(mask.ravel())
+        layers.label_geoms[label] = merged
+
+    # landuse per type, breakdown from pixel counts
+    by_landuse_type: dict[str, list] = {}
+    for f, geom in zip(landuse_raw, _pad(geoms_from_features(landuse_raw))):
+        if geom is not None:
+            by_landuse_type.setdefault(f["properties"].get("landuse_type", "unknown"), []).append((geom, f["properties"]))
+
+    for ltype, items in by_landuse_type.items():
+        mask = grid.fill([geom for geom, _ in items]).astype(bool) & inside
+        if not mask.any():
+            continue
+        merged = _mask_to_geometry(mask, layers.origin, pixel_deg)
+        if merged.is_empty or merged.geom_type not in ("Polygon", "MultiPolygon"):
+            continue
+        area_sqft = _area_px(mask) * layers.pixel_sqft
+        layers.landuse_breakdown[ltype] = round(area_sqft, 1)
+
+        lname = next((props.get("landuse_name") for _, props in items if props.get("landuse_name")), None)
+        layers.landuse_features.append({
+            "type": "Feature",
+            "geometry": dict(mapping(merged)),
+            "properties": {
+                "category": "landuse",
+                "area_sqft": area_sqft,
+                "color": CATEGORY_COLORS["landuse"],
+                "landuse_type": ltype,
+                "landuse_name": lname,
+            },
+        })
+
+    return layers
+
+
+class _Grid:
+    """lng/lat -> fixed point pixel coords on the analysis grid, and burning geometries into it"""
+
+    def __init__(self, west: float, north: float, pixel_deg: float, shape: tuple[int, int]):
+        self.west = west
+        self.north = north
+        self.pixel_deg = pixel_deg
+        self.shape = shape
+
+    def _pixels(self, coords: np.ndarray) -> np.ndarray:
+        cols = (coords[:, 0] - self.west) / self.pixel_deg
+        rows = (self.north - coords[:, 1]) / self.pixel_deg
+        return np.round(np.column_stack((cols, rows)) * (1 << SHIFT)).astype(np.int32)
+
+    def fill(self, geoms: list) -> np.ndarray:
+        out = np.zeros(self.shape, dtype=np.uint8)
+        for geom in geoms:
+            self.burn(out, geom, 1)
+        return out
+
+    def burn(self, out: np.ndarray, geom, value) -> None:
+        """Polygons filled (holes stay empty), anything else ignored, lines need buffering first"""
+        for part in shapely.get_parts(geom):
+            kind = part.geom_type
+            if kind == "Polygon":
+                rings = [part.exterior, *part.interiors]
+                # one fillPoly per polygon, even-odd across its own rings punches the holes
+                cv2.fillPoly(out, [self._pixels(np.asarray(r.coords)) for r in rings], value, cv2.LINE_8, SHIFT)
+            elif kind == "GeometryCollection":
+                self.burn(out, part, value)
+
+
+def _pad(geoms: np.ndarray) -> np.ndarray:
+    """Polygons grown by CLIP_PAD_DEG like the vector engine's clip does, buffered lines (already padded) left alone"""
+    out = geoms.copy()
+    polys = np.flatnonzero(np.isin(shapely.get_type_id(geoms), (3, 6)))  # Polygon, MultiPolygon
+    if len(polys):
+        out[polys] = shapely.buffer(geoms[polys], CLIP_PAD_DEG, quad_segs=16)
+    return out
+
+
+def _edges(raster: np.ndarray) -> np.ndarray:
+    """Pixels with a 4-neighbour (or the grid edge) holding a different value"""
+    padded = np.pad(raster, 1)
+    center = padded[1:-1, 1:-1]
+    return (
+        (center != padded[:-2, 1:-1]) | (center != padded[2:, 1:-1])
+        | (center != padded[1:-1, :-2]) | (center != padded[1:-1, 2:])
+    ) & (raster != 0)
+
+
+def _area_px(values: np.ndarray) -> float:
+    """
+    Pixel total with the outer ring of every shape at half weight. fillPoly paints
+    any pixel an edge touches, so each shape comes out about half a pixel too big all round
+    """
+    covered = (values != 0).astype(np.uint8)
+    edge = covered > cv2.erode(covered, CROSS, borderType=cv2.BORDER_CONSTANT, borderValue=0)
+    return float(values.sum(dtype=np.int64)) - float(values[edge].sum(dtype=np.int64)) / 2
+
+
+def _mask_to_geometry(mask: np.ndarray, origin: tuple[float, float], pixel_deg: float):
+    """Trace a grid mask back to one (multi)polygon for display"""
+    west, north = origin
+
+    def to_lng_lat(pixels: np.ndarray) -> np.ndarray:
+        return np.column_stack((west + pixels[:, 0] * pixel_deg, north - pixels[:, 1] * pixel_deg))
+
+    contours, _ = cv2.findContours(mask.astype(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # the outline runs through the edge pixel centres, so a blob one pixel wide traces to a ring with
+    # no area (a lone pixel to a single point) that contours_to_polygons drops. Those get their pixels back:
+    # the centre line grown half a pixel each side
+    areas = np.array([cv2.contourArea(c) for c in contours])
+    parts = shapely.get_parts(contours_to_polygons(
+        [c for c, area in zip(contours, areas) if area > 0], to_lng_lat, simplify_tolerance=pixel_deg / 2
+    ))
+    thin = [to_lng_lat(c.reshape(-1, 2).astype(np.float64)) for c, area in zip(contours, areas) if area == 0]
+    if thin:
+        centres = [shapely.Point(pts[0]) if len(pts) == 1 else shapely.LineString(pts) for pts in thin]
+        pixels = shapely.buffer(centres, pixel_deg / 2, cap_style="square", join_style="mitre")
+        parts = np.concatenate([parts, shapely.get_parts(pixels)])
+    parts = parts[shapely.get_type_id(parts) == 3]
+    if len(parts) == 0:
+        if mask.any():
+            print(f"[Raster] {int(mask.sum())} mask pixels traced to no geometry")
+        return shapely.Polygon()
+    # separate blobs never overlap, no need to union them
+    return parts[0] if len(parts) == 1 else shapely.multipolygons(parts)
@@ -0,0 +1,89 @@
+import asyncio
+
+import numpy as np
+
+from services.segmentation import SegmentationBackend
+
+
+class SegmentationScheduler:
+    """
+    Single queue in front of the segmentation backend, shared by every in-flight /analyze.
+    Tiles from different requests get packed into backend-sized batches, at most
+    max_concurrency batches run at once, and each caller gets its own tile's masks back.
+    The queue is bounded so a burst of big parcels waits here instead of piling onto the backend.
+    """
+
+    def __init__(
+        self,
+        backend: SegmentationBackend,
+        max_concurrency: int = 2,
+        max_wait_ms: float = 20.0,
+        max_queue: int = 256,
+    ):
+        self.backend = backend
+        self.max_batch_size = max(1, backend.max_batch_size)
+        self.max_wait_s = max_wait_ms / 1000
+        self._queue: asyncio.Queue[tuple[np.ndarray, asyncio.Future]] = asyncio.Queue(maxsize=max_queue)
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._worker: asyncio.Task | None = None
+        self._running: set[asyncio.Task] = set()
+
+    @property
+    def model_id(self) -> str:
+        return self.backend.model_id
+
+    def start(self) -> None:
+        self._worker = asyncio.create_task(self._collect())
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._worker, *self._running) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def segment(self, image: np.ndarray) -> dict[str, np.ndarray] | None:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))  # waits here when the queue is full
+        return await future
+
+    async def _collect(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+
+            # wait a few ms for other requests' tiles so the batch fills up, never longer
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # callers that went away (client disconnect) don't need a slot
+            batch = [(image, future) for image, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch: list[tuple[np.ndarray, asyncio.Future]]) -> None:
+        try:
+            results = await self.backend.segment([image for image, _ in batch])
+        except Exception as e:
+            print(f"[Segmentation] Batch of {len(batch)} failed at exception {e}")
+            results = [None] * len(batch)
+        finally:
+            self._slots.release()
+
+        for (_, future), masks in zip(batch, results):
+            if not future.done():
+                future.set_result(masks)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+
+import cv2
+import numpy as np
+
+from services.segmentation import MODEL_ID, SegmentationBackend, match_label
+
+# SegformerImageProcessor defaults, ImageNet stats on a 512x512 RGB input
+INPUT_SIZE = 512
+IMAGE_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+IMAGE_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+class OnnxSegformerBackend(SegmentationBackend):
+    """
+    SegFormer-b0 (ADE20K) running in process on CPU through ONNX Runtime.
+    model_dir is an optimum export of the HF checkpoint, ie it has model.onnx + config.json:
+        optimum-cli export onnx --model nvidia/segformer-b0-finetuned-ade-512-512 models/segformer-b0-ade
+    """
+
+    model_id = f"{MODEL_ID}@onnx"
+
+    def __init__(self, model_dir: str, max_batch_size: int = 8, num_threads: int | None = None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError(
+                "SEGMENTATION_BACKEND=onnx needs onnxruntime, pip install onnxruntime"
+            ) from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        # one session for the whole process, ORT's run() is safe to call from several threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, "model.onnx"),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        self.max_batch_size = max_batch_size
+
+        with open(os.path.join(model_dir, "config.json")) as f:
+            id2label = json.load(f)["id2label"]
+
+        # keyword -> every ADE class id that maps onto it, same matching as the HF labels
+        class_ids: dict[str, list[int]] = {}
+        for class_id, label in id2label.items():
+            matched = match_label(label)
+            if matched is not None:
+                class_ids.setdefault(matched, []).append(int(class_id))
+        self.class_ids = {kw: np.array(ids) for kw, ids in class_ids.items()}
+
+    async def segment(self, images: list[np.ndarray]) -> list[dict[str, np.ndarray] | None]:
+        results: list[dict[str, np.ndarray] | None] = []
+        for i in range(0, len(images), self.max_batch_size):
+            batch = images[i:i + self.max_batch_size]
+            results.extend(await asyncio.to_thread(self._run, batch))
+        return results
+
+    def _run(self, images: list[np.ndarray]) -> list[dict[str, np.ndarray] | None]:
+        batch = np.stack([_preprocess(image) for image in images])
+        try:
+            logits = self.session.run(None, {self.input_name: batch})[0]  # (N, 150, H/4, W/4)
+        except Exception as e:
+            print(f"ONNX segmentation failed at exception {e}")
+            return [None] * len(images)
+
+        return [self._to_masks(tile_logits, image.shape[:2]) for tile_logits, image in zip(logits, images)]
+
+    def _to_masks(self, logits: np.ndarray, shape: tuple[int, int]) -> dict[str, np.ndarray]:
+        h, w = shape
+        # upsample logits before argmax like the HF pipeline does, argmax at 1/4 res gives blocky edges.
+        # a class that loses at every low res pixel practically never wins after upsampling, so skip the other ~140
+        candidates = np.unique(logits.argmax(axis=0))
+        upsampled = np.stack([
+            cv2.resize(np.ascontiguousarray(logits[c]), (w, h), interpolation=cv2.INTER_LINEAR)
+            for c in candidates
+        ])
+        class_map = candidates[upsampled.argmax(axis=0)]
+
+        masks: dict[str, np.ndarray] = {}
+        for kw, ids in self.class_ids.items():
+            mask = np.isin(class_map, ids)
+            if mask.any():
+                masks[kw] = mask.astype(np.uint8) * np.uint8(255)
+        return masks
+
+
+def _preprocess(image_bgr: np.ndarray) -> np.ndarray:
+    image = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    if image.shape[:2] != (INPUT_SIZE, INPUT_SIZE):
+        image = cv2.resize(image, (INPUT_SIZE, INPUT_SIZE), interpolation=cv2.INTER_LINEAR)
+    image = (image.astype(np.float32) / 255.0 - IMAGE_MEAN) / IMAGE_STD
+    return image.transpose(2, 0, 1)  # HWC -> CHW
@@ -1,12 +1,17 @@
+import asyncio
 import base64
+import hashlib
 import io
+from abc import ABC, abstractmethod
 
 import cv2
-import httpx
 import numpy as np
 from PIL import Image
 
-HF_API_URL = "https://router.huggingface.co/hf-inference/models/nvidia/segformer-b0-finetuned-ade-512-512"
+from services.http_client import UpstreamClient
+
+MODEL_ID = "nvidia/segformer-b0-finetuned-ade-512-512"
+HF_BASE_URL = "https://router.huggingface.co"
 
 LABELS_TO_DETECT = {
     "tree",
@@ -19,19 +24,56 @@ LABELS_TO_DETECT = {
 }
 
 
-def segment_tile(image_bgr: np.ndarray, hf_token: str) -> dict[str, np.ndarray] | None:
+def match_label(label: str) -> str | None:
+    """Map a model label onto the keyword we track it under, None if we don't care about it"""
+    label = label.lower()
+    return next((kw for kw in LABELS_TO_DETECT if kw in label), None)
+
+
+class SegmentationBackend(ABC):
+    """
+    Anything that turns BGR tiles into {label: 0/255 mask}. model_id goes into the mask cache key
+    so switching backends never serves masks produced by a different model.
+    """
+
+    model_id: str = MODEL_ID
+    max_batch_size: int = 1
+
+    @abstractmethod
+    async def segment(self, images: list[np.ndarray]) -> list[dict[str, np.ndarray] | None]:
+        """One result per image, None where that tile failed"""
+
+
+class HFRouterBackend(SegmentationBackend):
+    """SegFormer on the HuggingFace inference router, one HTTP call per tile"""
+
+    model_id = MODEL_ID
+
+    def __init__(self, hf_token: str, http: UpstreamClient, base_url: str = HF_BASE_URL):
+        self.hf_token = hf_token
+        self.http = http
+        self.api_url = f"{base_url}/hf-inference/models/{MODEL_ID}"
+
+    async def segment(self, images: list[np.ndarray]) -> list[dict[str, np.ndarray] | None]:
+        return list(await asyncio.gather(
+            *(segment_tile(image, self.hf_token, self.http, api_url=self.api_url) for image in images)
+        ))
+
+
+async def segment_tile(
+    image_bgr: np.ndarray,
+    hf_token: str,
+    http: UpstreamClient,
+    api_url: str = f"{HF_BASE_URL}/hf-inference/models/{MODEL_ID}",
+) -> dict[str, np.ndarray] | None:
     """
     Send a satellite tile to the HuggingFace SegFormer api and get binary masks back
     """
-    # HF wants JPEG bytes cv2 gives us BGR so flip it first
-    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
-    buf = io.BytesIO()
-    Image.fromarray(image_rgb).save(buf, format="JPEG", quality=90)
-    image_bytes = buf.getvalue()
+    image_bytes = await asyncio.to_thread(_encode_jpeg, image_bgr)
 
     try:
-        response = httpx.post(
-            HF_API_URL,
+        response = await http.post(
+            api_url,
             content=image_bytes,
             headers={
                 "Authorization": f"Bearer {hf_token}",
@@ -49,15 +91,26 @@ def segment_tile(image_bgr: np.ndarray, hf_token: str) -> dict[str, np.ndarray]
         return None
 
     h, w = image_bgr.shape[:2]
+    return await asyncio.to_thread(_segments_to_masks, segments, h, w)
+
+
+def _encode_jpeg(image_bgr: np.ndarray) -> bytes:
+    # HF wants JPEG bytes cv2 gives us BGR so flip it first
+    image_rgb = cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGB)
+    buf = io.BytesIO()
+    Image.fromarray(image_rgb).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _segments_to_masks(segments: list, h: int, w: int) -> dict[str, np.ndarray]:
     masks: dict[str, np.ndarray] = {}
 
     for segment in segments:
-        label = segment.get("label", "").lower()
         mask_b64 = segment.get("mask", "")
         if not mask_b64:
             continue
 
-        matched = next((kw for kw in LABELS_TO_DETECT if kw in label), None)
+        matched = match_label(segment.get("label", ""))
         if matched is None:
             continue
 
@@ -76,4 +129,32 @@ def segment_tile(image_bgr: np.ndarray, hf_token: str) -> dict[str, np.ndarray]
         else:
             masks[matched] = mask_arr
 
-    return masks if masks else None
+    # empty dict is a real answer (nothing detected), None means the call failed
+    return masks
+
+
+def mask_cache_key(tile: dict, model_id: str = MODEL_ID) -> str:
+    """Masks depend on the tile, the model and which labels we keep, so all three go in the key"""
+    labels = hashlib.sha1(",".join(sorted(LABELS_TO_DETECT)).encode()).hexdigest()[:12]
+    return f"{model_id}/{labels}/{tile['zoom']}/{tile['x']}/{tile['y']}"
+
+
+def encode_masks(masks: dict[str, np.ndarray]) -> bytes:
+    """
+    Bit pack the binary masks, 512x512 goes from 256KB to 32KB per label before compression
+    """
+    buf = io.BytesIO()
+    arrays = {label: np.packbits(mask > 0) for label, mask in masks.items()}
+    shape = next(iter(masks.values())).shape if masks else (0, 0)
+    np.savez_compressed(buf, __shape__=np.array(shape, dtype=np.int32), **arrays)
+    return buf.getvalue()
+
+
+def decode_masks(data: bytes) -> dict[str, np.ndarray]:
+    with np.load(io.BytesIO(data), allow_pickle=False) as packed:
+        h, w = packed["__shape__"]
+        return {
+            label: np.unpackbits(packed[label], count=h * w).reshape(h, w) * np.uint8(255)
+            for label in packed.files
+            if label != "__shape__"
+        }
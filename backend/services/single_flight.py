@@ -0,0 +1,64 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, Iterable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work. The first caller for a key starts it, anyone asking for
+    the same key while it's still running awaits the same task instead of hitting upstream again.
+    The shared task runs detached from its callers, one of them disconnecting doesn't cancel it
+    for the others (and whatever it caches still lands).
+    """
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self.started = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._register(key, asyncio.ensure_future(fn()))
+        else:
+            self.shared += 1
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys: Iterable[Hashable], fn: Callable[[list], Awaitable[dict]]) -> dict:
+        """
+        Batch version, fn(keys) returns {key: result} for the keys nobody else is already fetching.
+        Keys in flight elsewhere are awaited, the rest go out together in one fn call.
+        """
+        keys = list(dict.fromkeys(keys))
+        futures = {key: self._inflight[key] for key in keys if key in self._inflight}
+        self.shared += len(futures)
+
+        todo = [key for key in keys if key not in futures]
+        if todo:
+            batch = asyncio.ensure_future(fn(todo))
+            for key in todo:
+                futures[key] = self._register(key, asyncio.ensure_future(_pick(batch, key)))
+
+        return {key: await asyncio.shield(future) for key, future in futures.items()}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "shared": self.shared}
+
+    def _register(self, key: Hashable, future: asyncio.Future) -> asyncio.Future:
+        self.started += 1
+        self._inflight[key] = future
+        future.add_done_callback(lambda f: self._done(key, f))
+        return future
+
+    def _done(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # every caller may have gone away, don't let asyncio log the error as never retrieved
+        if not future.cancelled():
+            future.exception()
+
+
+async def _pick(batch: asyncio.Future, key: Hashable):
+    return (await batch)[key]
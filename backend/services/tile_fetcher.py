@@ -1,8 +1,14 @@
+import asyncio
 import math
 
 import cv2
-import httpx
 import numpy as np
+import shapely
+
+from services.disk_cache import DiskCache
+from services.http_client import UpstreamClient
+
+MAPBOX_BASE_URL = "https://api.mapbox.com"
 
 
 def _lng_lat_to_tile(lng: float, lat: float, zoom: int) -> tuple[int, int]:
@@ -22,49 +28,102 @@ def _tile_to_lng_lat(x: int, y: int, zoom: int) -> tuple[float, float]:
     return lng, lat
 
 
-def compute_tile_grid(bbox: tuple, zoom: int = 18, tile_size: int = 512) -> list[dict]:
+def compute_tile_grid(bbox: tuple, zoom: int = 18, tile_size: int = 512, polygon=None) -> list[dict]:
     """
-    NW is the top corner, SE bottom corner so we calculating everything in between since corners keep consistency
+    NW is the top corner, SE bottom corner so we calculating everything in between since corners keep consistency.
+    With the drawn polygon, tiles that don't come near it are dropped, a thin diagonal or L shaped
+    parcel only fetches + segments the tiles along the shape instead of its whole bbox.
     """
     west, south, east, north = bbox
 
     x_min, y_min = _lng_lat_to_tile(west, north, zoom)  # NW corner
     x_max, y_max = _lng_lat_to_tile(east, south, zoom)  # SE corner
 
+    return _tile_range(x_min, x_max, y_min, y_max, zoom, polygon)
+
+
+def child_tiles(tile: dict, zoom: int, polygon=None) -> list[dict]:
+    """The tiles at a deeper zoom that make up this one (4 per zoom level), same polygon pruning as the grid"""
+    k = 2 ** (zoom - tile["zoom"])
+    x0, y0 = tile["x"] * k, tile["y"] * k
+    return _tile_range(x0, x0 + k - 1, y0, y0 + k - 1, zoom, polygon)
+
+
+def _tile_range(x_min: int, x_max: int, y_min: int, y_max: int, zoom: int, polygon=None) -> list[dict]:
+    # each grid line converted once instead of per tile, tile (x, y) spans edges x..x+1 and y..y+1.
+    # scalar math on purpose, numpy's sinh/arctan can land an ulp off and shift cached tile bounds
+    lng_edges = np.array([_tile_to_lng_lat(x, y_min, zoom)[0] for x in range(x_min, x_max + 2)])
+    lat_edges = np.array([_tile_to_lng_lat(x_min, y, zoom)[1] for y in range(y_min, y_max + 2)])
+
+    xs, ys = np.meshgrid(np.arange(x_min, x_max + 1), np.arange(y_min, y_max + 1), indexing="ij")
+    xs, ys = xs.ravel(), ys.ravel()
+    tile_west, tile_east = lng_edges[xs - x_min], lng_edges[xs - x_min + 1]
+    tile_north, tile_south = lat_edges[ys - y_min], lat_edges[ys - y_min + 1]
+
+    if polygon is not None:
+        # within the same 1e-6 tolerance clipping uses, so anything a tile could contribute is kept
+        shapely.prepare(polygon)
+        keep = shapely.dwithin(shapely.box(tile_west, tile_south, tile_east, tile_north), polygon, 0.000001)
+        xs, ys = xs[keep], ys[keep]
+        tile_west, tile_east, tile_north, tile_south = tile_west[keep], tile_east[keep], tile_north[keep], tile_south[keep]
+
     tiles = []
-    for x in range(x_min, x_max + 1):
-        for y in range(y_min, y_max + 1):
-            tile_west, tile_north = _tile_to_lng_lat(x, y, zoom)
-            tile_east, tile_south = _tile_to_lng_lat(x + 1, y + 1, zoom)
-            tiles.append({
-                "x": x,
-                "y": y,
-                "zoom": zoom,
-                "bounds": [tile_west, tile_south, tile_east, tile_north],
-                "center": [(tile_west + tile_east) / 2, (tile_north + tile_south) / 2], #could honestly remove this, redundant
-            })
+    for x, y, w, s, e, nth in zip(
+        xs.tolist(), ys.tolist(), tile_west.tolist(), tile_south.tolist(), tile_east.tolist(), tile_north.tolist()
+    ):
+        tiles.append({
+            "x": x,
+            "y": y,
+            "zoom": zoom,
+            "bounds": [w, s, e, nth],
+            "center": [(w + e) / 2, (nth + s) / 2], #could honestly remove this, redundant
+        })
 
     return tiles
 
 
-def fetch_satellite_tile(tile: dict, tile_size: int, mapbox_token: str) -> np.ndarray | None: #using ndarray cuz used by cv2
+def tile_cache_key(tile: dict) -> str:
+    return f"{tile['zoom']}/{tile['x']}/{tile['y']}"
+
+
+async def fetch_satellite_tile(
+    tile: dict,
+    tile_size: int,
+    mapbox_token: str,
+    http: UpstreamClient,
+    cache: DiskCache | None = None,
+    base_url: str = MAPBOX_BASE_URL,
+) -> np.ndarray | None: #using ndarray cuz used by cv2
     """
     fetch a satellite imagery tile 
+    JPEG bytes are kept in the disk cache by (zoom, x, y) so neighbouring parcels reuse them
     """
     x, y, zoom = tile["x"], tile["y"], tile["zoom"]
 
-    # doubles the pixel dimensions 256x256 -> 512x512
-    url = (
-        f"https://api.mapbox.com/v4/mapbox.satellite/{zoom}/{x}/{y}@2x.jpg90?access_token={mapbox_token}"
-    )
+    content = await asyncio.to_thread(cache.get, tile_cache_key(tile)) if cache is not None else None
+
+    if content is None:
+        # doubles the pixel dimensions 256x256 -> 512x512
+        url = (
+            f"{base_url}/v4/mapbox.satellite/{zoom}/{x}/{y}@2x.jpg90?access_token={mapbox_token}"
+        )
+
+        try:
+            response = await http.get(url, timeout=15.0)
+            response.raise_for_status()
+        except Exception:
+            return None
+
+        content = response.content
+        if cache is not None:
+            await asyncio.to_thread(cache.put, tile_cache_key(tile), content)
+
+    # jpeg decode is CPU work, keep it off the event loop
+    return await asyncio.to_thread(_decode_tile, content, tile_size)
 
-    try:
-        response = httpx.get(url, timeout=15.0)
-        response.raise_for_status()
-    except Exception:
-        return None
 
-    image_bytes = np.frombuffer(response.content, dtype=np.uint8)
+def _decode_tile(content: bytes, tile_size: int) -> np.ndarray | None:
+    image_bytes = np.frombuffer(content, dtype=np.uint8)
     image = cv2.imdecode(image_bytes, cv2.IMREAD_COLOR)  # BGR
     if image is None:
         return None
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend imports itself as top level packages (services, bench), same as running main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from services import osm_fetcher
+
+OVERPASS = {
+    "version": 0.6,
+    "elements": [
+        {"type": "node", "id": 3, "lat": 37.0001, "lon": -122.0001},
+        {"type": "node", "id": 1, "lat": 37.0, "lon": -122.0},
+        {"type": "node", "id": 2, "lat": 37.0, "lon": -122.0002},
+        {"type": "node", "id": 9, "lat": 37.0003, "lon": -122.0003, "tags": {"natural": "tree"}},
+        {"type": "way", "id": 10, "nodes": [1, 2, 3, 1], "tags": {"building": "yes"}},
+        # 404 isn't in the response, dropped from the way
+        {"type": "way", "id": 11, "nodes": [1, 404, 3], "tags": {"highway": "residential"}},
+        {"type": "way", "id": 12, "nodes": [2, 3]},
+    ],
+}
+
+
+def _read(payload):
+    return [(el, None if coords is None else coords.tolist()) for el, coords in osm_fetcher._read_elements(payload)]
+
+
+@pytest.fixture(params=["ijson", "json"])
+def parser(request, monkeypatch):
+    if request.param == "ijson":
+        pytest.importorskip("ijson")
+    else:
+        monkeypatch.setattr(osm_fetcher, "ijson", None)
+    return request.param
+
+
+@pytest.mark.parametrize("wrap", [bytes, io.BytesIO], ids=["bytes", "file"])
+def test_read_elements(parser, wrap):
+    elements = _read(wrap(json.dumps(OVERPASS).encode()))
+
+    assert [(el["type"], el["id"]) for el, _ in elements] == [("node", 9), ("way", 10), ("way", 11)]
+    tree, building, road = (coords for _, coords in elements)
+    assert tree is None
+    assert building == [[-122.0, 37.0], [-122.0002, 37.0], [-122.0001, 37.0001], [-122.0, 37.0]]
+    assert road == [[-122.0, 37.0], [-122.0001, 37.0001]]
+    assert all("nodes" not in el for el, _ in elements)
+
+
+def test_parsers_agree(monkeypatch):
+    pytest.importorskip("ijson")
+    payload = json.dumps(OVERPASS).encode()
+    streamed = _read(payload)
+    monkeypatch.setattr(osm_fetcher, "ijson", None)
+    loaded = _read(payload)
+
+    assert streamed == loaded
+    for (a, _), (b, _) in zip(streamed, loaded):
+        assert type(a.get("lat")) is type(b.get("lat"))
+
+
+def test_empty_response(parser):
+    assert osm_fetcher._read_elements(b'{"elements": []}') == []
+    assert osm_fetcher._read_elements(b'{"version": 0.6}') == []
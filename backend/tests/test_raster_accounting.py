@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon, shape
+
+from services.geometry import area_scale
+from services.raster_accounting import _area_px, _mask_to_geometry, raster_clip_features
+
+PIXEL_DEG = 1e-5
+ORIGIN = (-122.0, 37.0)
+
+
+@pytest.mark.parametrize("rows, cols", [
+    (slice(10, 11), slice(5, 45)),   # horizontal line
+    (slice(5, 45), slice(10, 11)),   # vertical line
+    (slice(20, 21), slice(20, 21)),  # lone pixel
+])
+def test_thin_mask_traces_to_its_pixels(rows, cols):
+    mask = np.zeros((50, 50), dtype=np.uint8)
+    mask[rows, cols] = 1
+
+    geom = _mask_to_geometry(mask, ORIGIN, PIXEL_DEG)
+
+    assert not geom.is_empty
+    assert geom.area / PIXEL_DEG ** 2 == pytest.approx(mask.sum())
+
+
+def test_diagonal_line_is_kept():
+    mask = np.eye(30, dtype=np.uint8)
+
+    geom = _mask_to_geometry(mask, ORIGIN, PIXEL_DEG)
+
+    assert not geom.is_empty
+    assert geom.area > 0
+
+
+def test_wide_mask_still_traces_through_pixel_centres():
+    mask = np.zeros((50, 50), dtype=np.uint8)
+    mask[10:20, 10:30] = 1
+
+    geom = _mask_to_geometry(mask, ORIGIN, PIXEL_DEG)
+
+    # outline through the edge pixel centres, (10 - 1) x (20 - 1) pixels
+    assert geom.area / PIXEL_DEG ** 2 == pytest.approx(9 * 19)
+
+
+def test_one_pixel_road_gets_a_feature():
+    parcel = Polygon([(-122.001, 37.0), (-121.999, 37.0), (-121.999, 37.001), (-122.001, 37.001)])
+    # along the centre of a 1 m pixel row, 0.2 m wide
+    meters_per_deg, _ = area_scale(parcel)
+    lat = 37.001 - 40 / meters_per_deg
+    road = {
+        "type": "Feature",
+        "geometry": {"type": "LineString", "coordinates": [[-122.0008, lat], [-121.9992, lat]]},
+        "properties": {"label": "road", "road_type": "footway", "width_m": 0.2, "road_surface_weight": 1.0},
+    }
+
+    layers = raster_clip_features([road], parcel, resolution_m=1.0)
+
+    # the road burns a single row of pixels
+    assert len(layers.road_weight_masks) == 1
+    rows = np.flatnonzero(layers._unpack(layers.road_weight_masks[100]).any(axis=1))
+    assert len(rows) == 1
+
+    feature = layers.road_feature
+    assert feature is not None
+    geom = shape(feature["geometry"])
+    assert not geom.is_empty
+    assert feature["properties"]["area_sqft"] > 0
+    # the outline covers the road's pixels, the area counts them at half weight on the edges
+    assert shapely.area(geom) * layers.sqft_per_deg2 >= feature["properties"]["area_sqft"]
+
+
+def test_area_px_counts_a_line_at_half_weight():
+    mask = np.zeros((5, 20), dtype=np.uint8)
+    mask[2, 2:18] = 1
+
+    assert _area_px(mask) == pytest.approx(8)
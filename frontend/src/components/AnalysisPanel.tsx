@@ -71,7 +71,7 @@ export default function AnalysisPanel({
           {state.status === "drawing" && "Click to draw vertices. Double-click to finish."}
           {state.status === "ready" && "Zone drawn. Ready to analyze."}
           {state.status === "analyzing" && "Analyzing satellite imagery..."}
-          {state.status === "complete" && "Analysis complete"}
+          {state.status === "complete" && (state.stale ? "Results out of date" : "Analysis complete")}
           {state.status === "error" && "Analysis failed"}
         </p>
       </div>
@@ -109,6 +109,22 @@ export default function AnalysisPanel({
           </div>
         )}
 
+        {state.status === "complete" && state.stale && (
+          <div
+            style={{
+              padding: "10px 12px",
+              backgroundColor: "#FFFBEB",
+              border: "1px solid #FDE68A",
+              borderRadius: "6px",
+              color: "#B45309",
+              fontSize: "13px",
+              lineHeight: "1.4",
+            }}
+          >
+            {state.stale}
+          </div>
+        )}
+
         {state.status === "complete" && (
           <button onClick={onClear} style={secondaryBtnStyle}>
             Clear & Start Over
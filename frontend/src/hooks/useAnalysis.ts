@@ -1,4 +1,4 @@
-import { useState } from "react";
+import { useCallback, useEffect, useRef, useState } from "react";
 import type {
   AnalysisState,
   AnalysisResponse,
@@ -9,19 +9,42 @@ import type {
 } from "../types";
 import { DEFAULT_SETTINGS } from "../types";
 
+// Sliders fire on every step, only recompute once they settle
+const RECOMPUTE_DEBOUNCE_MS = 300;
+
 export function useAnalysis() {
   const [state, setState] = useState<AnalysisState>({ status: "idle" });
   const [layerVisibility, setLayerVisibility] = useState<LayerVisibility>({});
   const [settings, setSettings] = useState<UserSettings>(DEFAULT_SETTINGS);
+  // Latest settings without waiting for a render, so quick successive changes build on each other
+  const settingsRef = useRef<UserSettings>(DEFAULT_SETTINGS);
+  const recomputeTimer = useRef<ReturnType<typeof setTimeout> | undefined>(undefined);
+  const recomputeAbort = useRef<AbortController | null>(null);
+
+  const cancelRecompute = useCallback(() => {
+    clearTimeout(recomputeTimer.current);
+    recomputeAbort.current?.abort();
+    recomputeAbort.current = null;
+  }, []);
 
-  const startDrawing = () => setState({ status: "drawing" });
+  useEffect(() => cancelRecompute, [cancelRecompute]);
 
-  const setPolygon = (polygon: UserPolygon) =>
+  const startDrawing = () => {
+    cancelRecompute();
+    setState({ status: "drawing" });
+  };
+
+  const setPolygon = (polygon: UserPolygon) => {
+    cancelRecompute();
     setState({ status: "ready", polygon });
+  };
 
-  const analyze = async () => {
-    if (state.status !== "ready") return;
-    const polygon = state.polygon;
+  // Full run against the polygon, resolves to the result or null if it failed / was aborted
+  const runAnalysis = async (
+    polygon: UserPolygon,
+    analysisSettings: UserSettings,
+    signal?: AbortSignal
+  ): Promise<AnalysisResponse | null> => {
     setState({ status: "analyzing", polygon });
 
     try {
@@ -34,31 +57,44 @@ export function useAnalysis() {
             type: polygon.type,
             geometry: polygon.geometry,
             properties: polygon.properties,
-            settings,
+            settings: analysisSettings,
           }),
+          signal,
         }
       );
 
       if (!response.ok) {
         const error = await response.json();
+        if (signal?.aborted) return null;
         setState({
           status: "error",
           message: error.detail || "Analysis failed",
         });
-        return;
+        return null;
       }
 
       const result: AnalysisResponse = await response.json();
+      if (signal?.aborted) return null;
       setState({ status: "complete", polygon, result });
+      return result;
     } catch (err) {
+      if (signal?.aborted) return null;
       setState({
         status: "error",
         message: "Failed to connect to analysis server. Make sure the backend is running on port 8000.",
       });
+      return null;
     }
   };
 
+  const analyze = async () => {
+    if (state.status !== "ready") return;
+    cancelRecompute();
+    await runAnalysis(state.polygon, settingsRef.current);
+  };
+
   const clear = () => {
+    cancelRecompute();
     setState({ status: "idle" });
     setLayerVisibility({});
   };
@@ -67,8 +103,79 @@ export function useAnalysis() {
     setLayerVisibility((prev) => ({ ...prev, [category]: !prev[category] }));
   };
 
+  // Settings only change the accounting, so re-run that server side against the stored geometry
+  const recompute = async (analysisId: string, polygon: UserPolygon, nextSettings: UserSettings) => {
+    // A newer change supersedes whatever is still in flight
+    recomputeAbort.current?.abort();
+    const controller = new AbortController();
+    recomputeAbort.current = controller;
+
+    // Keep the old numbers up, but say they don't match the sliders anymore
+    const markStale = (message: string) =>
+      setState((prev) =>
+        prev.status === "complete" && prev.result.analysis_id === analysisId
+          ? { ...prev, stale: message }
+          : prev
+      );
+
+    try {
+      const response = await fetch(
+        `${import.meta.env.VITE_API_URL}/analyze/${analysisId}/recompute`,
+        {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify(nextSettings),
+          signal: controller.signal,
+        }
+      );
+      if (controller.signal.aborted) return;
+
+      // The server no longer has the geometry, run the whole analysis again with the new settings
+      if (response.status === 404) {
+        const result = await runAnalysis(polygon, nextSettings, controller.signal);
+        // Sliders moved while it ran, catch up on the latest
+        if (result?.analysis_id && settingsRef.current !== nextSettings) {
+          recompute(result.analysis_id, polygon, settingsRef.current);
+        }
+        return;
+      }
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        if (controller.signal.aborted) return;
+        markStale(`Results are out of date: ${error.detail || "couldn't apply the new settings"}`);
+        return;
+      }
+
+      const updated: AnalysisResponse = await response.json();
+      if (controller.signal.aborted) return;
+      // Only onto the analysis it was computed for, a cleared or redrawn polygon stays that way
+      setState((prev) =>
+        prev.status === "complete" && prev.result.analysis_id === analysisId
+          ? { ...prev, result: updated, stale: undefined }
+          : prev
+      );
+    } catch (err) {
+      // Aborted by a newer change, nothing to report
+      if (controller.signal.aborted) return;
+      markStale("Results are out of date: couldn't reach the analysis server to apply the new settings");
+    } finally {
+      if (recomputeAbort.current === controller) recomputeAbort.current = null;
+    }
+  };
+
   const updateSettings = (partial: Partial<UserSettings>) => {
-    setSettings((prev) => ({ ...prev, ...partial }));
+    const next = { ...settingsRef.current, ...partial };
+    settingsRef.current = next;
+    setSettings(next);
+
+    if (state.status !== "complete" || !state.result.analysis_id) return;
+    const analysisId = state.result.analysis_id;
+    const polygon = state.polygon;
+    clearTimeout(recomputeTimer.current);
+    recomputeTimer.current = setTimeout(
+      () => recompute(analysisId, polygon, next),
+      RECOMPUTE_DEBOUNCE_MS
+    );
   };
 
   return {
@@ -56,6 +56,8 @@ export interface AnalysisResponse {
   type: "FeatureCollection";
   features: DetectedFeature[];
   metadata: AnalysisMetadata;
+  // Lets settings changes hit /analyze/{id}/recompute instead of a full re-analysis
+  analysis_id?: string;
 }
 
 export interface AnalysisMetadata {
@@ -91,6 +93,15 @@ export interface AnalysisMetadata {
   // Processing
   tiles_processed: number;
   processing_time_ms: number;
+  // Multi-resolution mode only: imagery zoom used for each part of the parcel
+  regions?: ResolutionRegion[];
+  // ms per pipeline stage, missing on recomputes
+  timings?: Record<string, number> | null;
+}
+
+export interface ResolutionRegion {
+  zoom: number;
+  bounds: [number, number, number, number]; // west, south, east, north
 }
 
 export type LayerVisibility = Record<CategoryType, boolean>;
@@ -139,5 +150,6 @@ export type AnalysisState =
   | { status: "drawing" }
   | { status: "ready"; polygon: UserPolygon }
   | { status: "analyzing"; polygon: UserPolygon }
-  | { status: "complete"; polygon: UserPolygon; result: AnalysisResponse }
+  // stale: the settings changed but the results couldn't be recomputed, says why
+  | { status: "complete"; polygon: UserPolygon; result: AnalysisResponse; stale?: string }
   | { status: "error"; message: string };